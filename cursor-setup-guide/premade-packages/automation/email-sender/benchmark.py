@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Email Sender Benchmarks
+Measure template rendering speed and email throughput against a local SMTP sink.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Callable, List, Any
+
+from email_sender import (
+    render_template,
+    send_email,
+    send_bulk,
+    SMTPSession,
+    MailOutbox,
+    build_message
+)
+from smtp_sink import SMTPSink
+
+
+def render_template_replace(template: str, variables: Dict[str, str]) -> str:
+    """Previous implementation: one full-string replace per variable."""
+    result = template
+    for key, value in variables.items():
+        result = result.replace(f"{{{{{key}}}}}", str(value))
+    return result
+
+
+def _build_template(variable_count: int, paragraph_repeats: int) -> str:
+    """Build an HTML email that uses every variable a few times."""
+    paragraph = "".join(
+        f"<p>Lorem ipsum dolor sit amet, {{{{var{i}}}}} consectetur adipiscing elit.</p>\n"
+        for i in range(variable_count)
+    )
+    return "<html><body>\n<h1>Hello {{var0}}!</h1>\n" + paragraph * paragraph_repeats + "</body></html>"
+
+
+def _time_renders(render: Callable[[], str], renders: int) -> float:
+    """Return seconds taken for the given number of renders."""
+    start = time.perf_counter()
+    for _ in range(renders):
+        render()
+    return time.perf_counter() - start
+
+
+def bench_templates(renders: int = 100_000, variable_count: int = 10, paragraph_repeats: int = 3):
+    """
+    Compare the compiled template engine against str.replace rendering.
+    
+    Args:
+        renders (int): Renders per implementation
+        variable_count (int): Distinct variables in the template
+        paragraph_repeats (int): How many times the body is repeated
+    """
+    template = _build_template(variable_count, paragraph_repeats)
+    variables = {f"var{i}": f"value-{i}" for i in range(variable_count)}
+    
+    # Both implementations must agree before timing them
+    assert render_template(template, variables) == render_template_replace(template, variables)
+    
+    print(f"Template: {len(template)} chars, {variable_count} variables, {renders:,} renders")
+    
+    implementations = [
+        ("str.replace per variable", lambda: render_template_replace(template, variables)),
+        ("compiled (cached)", lambda: render_template(template, variables)),
+        ("compiled + HTML escape", lambda: render_template(template, variables, escape=True)),
+    ]
+    baseline = None
+    for name, render in implementations:
+        elapsed = _time_renders(render, renders)
+        baseline = baseline or elapsed
+        print(
+            f"  {name:<26} {elapsed:7.3f}s  "
+            f"{renders / elapsed:>10,.0f} renders/s  "
+            f"{baseline / elapsed:5.2f}x"
+        )
+
+
+def _messages(count: int) -> List[Dict[str, Any]]:
+    """Build send_email() keyword arguments for count recipients."""
+    return [
+        {
+            "to": f"user{i}@example.com",
+            "subject": "Welcome {{name}}!",
+            "body": "<p>Hello {{name}}, your code is {{code}}.</p>",
+            "html": True,
+            "template_vars": {"name": f"User {i}", "code": str(100000 + i)}
+        }
+        for i in range(count)
+    ]
+
+
+def _run_single(messages: List[Dict[str, Any]], connections: int) -> int:
+    """send_email() per message: one connection, STARTTLS and login each."""
+    sent = 0
+    for message in messages:
+        sent += send_email(**message)
+    return sent
+
+
+def _run_pooled(messages: List[Dict[str, Any]], connections: int) -> int:
+    """One SMTPSession reused for every message, sent one after another."""
+    sent = 0
+    with SMTPSession() as smtp_session:
+        for message in messages:
+            try:
+                smtp_session.send(build_message(from_email=smtp_session.user, **message))
+                sent += 1
+            except Exception:
+                pass
+    return sent
+
+
+def _run_bulk(messages: List[Dict[str, Any]], connections: int) -> int:
+    """send_bulk() over parallel pooled connections."""
+    return sum(send_bulk(messages, connections=connections))
+
+
+def _run_queued(messages: List[Dict[str, Any]], connections: int) -> int:
+    """MailOutbox: enqueue everything, then wait for the workers to drain it."""
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = MailOutbox(
+            os.path.join(directory, "outbox.db"),
+            workers=connections,
+            rate=1_000_000,
+            max_attempts=1
+        )
+        for message in messages:
+            outbox.enqueue(**message)
+        outbox.start()
+        while True:
+            status = outbox.status()
+            if status["pending"] + status["sending"] == 0:
+                break
+            time.sleep(0.01)
+        outbox.close()
+    return status["sent"]
+
+
+SMTP_MODES = {
+    "single": _run_single,
+    "pooled": _run_pooled,
+    "bulk": _run_bulk,
+    "queued": _run_queued,
+}
+
+
+def bench_smtp(
+    count: int = 500,
+    modes: List[str] = None,
+    connections: int = 4,
+    latency: float = 0.0,
+    fail_rate: float = 0.0,
+    disconnect_rate: float = 0.0,
+    as_json: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Send messages through a local SMTP sink in each mode and report throughput.
+    
+    Args:
+        count (int): Messages per mode
+        modes (list, optional): Subset of SMTP_MODES to run
+        connections (int): Parallel connections for bulk and queued modes
+        latency (float): Sink delay before every reply, in seconds
+        fail_rate (float): Chance the sink rejects a message with 451
+        disconnect_rate (float): Chance the sink drops the connection
+        as_json (bool): Print JSON instead of a table
+    
+    Returns:
+        list: One result dict per mode
+    """
+    results = []
+    with SMTPSink(latency=latency, fail_rate=fail_rate, disconnect_rate=disconnect_rate, seed=42) as sink:
+        os.environ.update({
+            "SMTP_HOST": sink.host,
+            "SMTP_PORT": str(sink.port),
+            "SMTP_USER": "bench@example.com",
+            "SMTP_PASSWORD": "bench",
+            "SMTP_USE_TLS": "false"
+        })
+        
+        for mode in modes or list(SMTP_MODES):
+            messages = _messages(count)
+            sink.reset()
+            tracemalloc.start()
+            start = time.perf_counter()
+            # The senders print per message; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                sent = SMTP_MODES[mode](messages, connections)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            
+            stats = sink.stats()
+            results.append({
+                "mode": mode,
+                "messages": count,
+                "sent": sent,
+                "seconds": round(elapsed, 4),
+                "messages_per_second": round(sent / elapsed, 1) if elapsed else 0.0,
+                "handshakes_per_message": round(stats["connections"] / count, 4),
+                "logins_per_message": round(stats["logins"] / count, 4),
+                "peak_memory_kb": round(peak / 1024, 1),
+                "sink": stats
+            })
+    
+    if as_json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(
+            f"{count} messages per mode, latency={latency}s, "
+            f"fail_rate={fail_rate}, disconnect_rate={disconnect_rate}"
+        )
+        print(f"  {'mode':<8} {'sent':>6} {'msg/s':>10} {'handshakes/msg':>15} {'peak mem':>12}")
+        for result in results:
+            print(
+                f"  {result['mode']:<8} {result['sent']:>6} "
+                f"{result['messages_per_second']:>10,.1f} "
+                f"{result['handshakes_per_message']:>15.3f} "
+                f"{result['peak_memory_kb']:>9,.0f} KB"
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the email sender")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    
+    templates_parser = subparsers.add_parser("templates", help="Template rendering speed")
+    templates_parser.add_argument("--renders", type=int, default=100_000, help="Renders per implementation")
+    templates_parser.add_argument("--variables", type=int, default=10, help="Variables in the template")
+    templates_parser.add_argument("--repeats", type=int, default=3, help="Times the template body is repeated")
+    
+    smtp_parser = subparsers.add_parser("smtp", help="Send throughput against a local SMTP sink")
+    smtp_parser.add_argument("--messages", type=int, default=500, help="Messages per mode")
+    smtp_parser.add_argument("--modes", nargs="+", choices=list(SMTP_MODES), help="Modes to run")
+    smtp_parser.add_argument("--connections", type=int, default=4, help="Parallel connections")
+    smtp_parser.add_argument("--latency", type=float, default=0.0, help="Sink delay per reply in seconds")
+    smtp_parser.add_argument("--fail-rate", type=float, default=0.0, help="Chance of a 451 per message")
+    smtp_parser.add_argument("--disconnect-rate", type=float, default=0.0, help="Chance of a dropped connection")
+    smtp_parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    
+    args = parser.parse_args()
+    
+    if args.benchmark == "templates":
+        bench_templates(args.renders, args.variables, args.repeats)
+    else:
+        bench_smtp(
+            count=args.messages,
+            modes=args.modes,
+            connections=args.connections,
+            latency=args.latency,
+            fail_rate=args.fail_rate,
+            disconnect_rate=args.disconnect_rate,
+            as_json=args.json
+        )
@@ -5,70 +5,238 @@ Send templated HTML emails using Gmail API or SMTP.
 """
 
 import smtplib
+import socket
 import os
+import mmap
+import base64
+import mimetypes
+import re
+import html
+import json
+import time
+import queue
+import random
+import sqlite3
+import threading
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
-from email import encoders
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple, Any
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-def render_template(template: str, variables: Dict[str, str]) -> str:
+# {{name}} placeholders; braces are not allowed inside the name
+_PLACEHOLDER = re.compile(r"\{\{([^{}]+)\}\}")
+
+
+class CompiledTemplate:
+    """Template split once into literal text and placeholder names."""
+    
+    def __init__(self, template: str):
+        """
+        Args:
+            template (str): Template string with {{variable}} placeholders
+        """
+        self.source = template
+        # split() alternates literal, name, literal, ..., literal
+        parts = _PLACEHOLDER.split(template)
+        self._literals = parts[0::2]
+        self._names = parts[1::2]
+        self.variables = frozenset(self._names)
+    
+    def render(
+        self,
+        variables: Dict[str, Any],
+        escape: bool = False,
+        strict: bool = False
+    ) -> str:
+        """
+        Render the template with a single join.
+        
+        Args:
+            variables (dict): Variables to substitute
+            escape (bool): HTML-escape substituted values
+            strict (bool): Raise KeyError if a placeholder has no variable.
+                Otherwise the placeholder is left as-is
+        
+        Returns:
+            str: Rendered template
+        """
+        if strict:
+            missing = self.variables.difference(variables)
+            if missing:
+                raise KeyError(f"Missing template variables: {', '.join(sorted(missing))}")
+        
+        literals = self._literals
+        parts = [literals[0]]
+        for index, name in enumerate(self._names, 1):
+            if name in variables:
+                value = str(variables[name])
+                if escape:
+                    value = html.escape(value)
+            else:
+                value = f"{{{{{name}}}}}"
+            parts.append(value)
+            parts.append(literals[index])
+        return "".join(parts)
+
+
+@lru_cache(maxsize=256)
+def compile_template(template: str) -> CompiledTemplate:
+    """Compile a template, reusing earlier compilations of the same string."""
+    return CompiledTemplate(template)
+
+
+def render_template(
+    template: str,
+    variables: Dict[str, str],
+    escape: bool = False,
+    strict: bool = False
+) -> str:
     """
     Render template with variables.
     
     Args:
         template (str): Template string with {{variable}} placeholders
         variables (dict): Variables to replace
+        escape (bool): HTML-escape substituted values
+        strict (bool): Raise KeyError for placeholders without a variable
     
     Returns:
         str: Rendered template
     """
-    result = template
-    for key, value in variables.items():
-        result = result.replace(f"{{{{{key}}}}}", str(value))
-    return result
+    return compile_template(template).render(variables, escape=escape, strict=strict)
 
 
-def send_email_smtp(
+def _encode_file(path: str, mmap_threshold: int) -> str:
+    """Read and base64-encode a file, memory-mapping it when large."""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= mmap_threshold:
+            # Encodes straight from the page cache without a full bytes copy
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return base64.encodebytes(mapped).decode('ascii')
+        return base64.encodebytes(f.read()).decode('ascii')
+
+
+class PreparedAttachment:
+    """An attachment that has already been read and base64-encoded."""
+    
+    def __init__(self, path: str, encoded: str):
+        """
+        Args:
+            path (str): Source file path
+            encoded (str): Base64 payload
+        """
+        self.filename = os.path.basename(path)
+        mime_type, _ = mimetypes.guess_type(path)
+        self.maintype, self.subtype = (mime_type or 'application/octet-stream').split('/', 1)
+        self.encoded = encoded
+    
+    def to_part(self) -> MIMEBase:
+        """Build a MIME part without re-reading or re-encoding the file."""
+        part = MIMEBase(self.maintype, self.subtype)
+        part.set_payload(self.encoded)
+        part['Content-Transfer-Encoding'] = 'base64'
+        part.add_header('Content-Disposition', 'attachment', filename=self.filename)
+        return part
+
+
+class AttachmentCache:
+    """Memory-bounded LRU of encoded attachments keyed by path and mtime."""
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, mmap_threshold: int = 1024 * 1024):
+        """
+        Args:
+            max_bytes (int): Maximum encoded bytes kept in memory
+            mmap_threshold (int): Files at least this large are memory-mapped
+                while encoding
+        """
+        self.max_bytes = max_bytes
+        self.mmap_threshold = mmap_threshold
+        self.hits = 0
+        self.misses = 0
+        
+        self._lock = threading.Lock()
+        # path -> ((mtime_ns, size), PreparedAttachment)
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], PreparedAttachment]]" = OrderedDict()
+        self._bytes = 0
+    
+    def get(self, path: str) -> PreparedAttachment:
+        """
+        Return the encoded attachment, encoding it only if the file changed.
+        
+        Raises:
+            OSError: If the file can't be read
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        
+        # Encode outside the lock so other attachments aren't blocked
+        prepared = PreparedAttachment(path, _encode_file(path, self.mmap_threshold))
+        size = len(prepared.encoded)
+        
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._bytes -= len(old[1].encoded)
+            if size <= self.max_bytes:
+                self._entries[path] = (key, prepared)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted.encoded)
+        return prepared
+    
+    def clear(self):
+        """Drop every cached attachment."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def build_message(
     to: str,
     subject: str,
     body: str,
+    from_email: str,
     html: bool = False,
-    from_email: Optional[str] = None,
     attachments: Optional[List[str]] = None,
-    template_vars: Optional[Dict[str, str]] = None
-) -> bool:
+    template_vars: Optional[Dict[str, str]] = None,
+    attachment_cache: Optional[AttachmentCache] = None
+) -> MIMEMultipart:
     """
-    Send email using SMTP.
+    Build a MIME message ready to send.
     
     Args:
         to (str): Recipient email
         subject (str): Email subject
         body (str): Email body
+        from_email (str): Sender email
         html (bool): Whether body is HTML
-        from_email (str, optional): Sender email
         attachments (list, optional): List of file paths to attach
         template_vars (dict, optional): Variables to replace in template
+        attachment_cache (AttachmentCache, optional): Reuse encoded
+            attachments across messages
     
     Returns:
-        bool: True if successful
+        MIMEMultipart: The message
     """
-    smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_USER")
-    smtp_password = os.getenv("SMTP_PASSWORD")
-    
-    if not smtp_user or not smtp_password:
-        print("Error: SMTP_USER and SMTP_PASSWORD must be set in .env")
-        return False
-    
-    if not from_email:
-        from_email = smtp_user
-    
     # Render template if variables provided
     if template_vars:
         subject = render_template(subject, template_vars)
@@ -87,27 +255,264 @@ def send_email_smtp(
     if attachments:
         for file_path in attachments:
             if os.path.exists(file_path):
-                with open(file_path, 'rb') as f:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(f.read())
-                    encoders.encode_base64(part)
-                    part.add_header(
-                        'Content-Disposition',
-                        f'attachment; filename={os.path.basename(file_path)}'
-                    )
-                    msg.attach(part)
+                if attachment_cache:
+                    prepared = attachment_cache.get(file_path)
+                else:
+                    prepared = PreparedAttachment(file_path, _encode_file(file_path, 1024 * 1024))
+                msg.attach(prepared.to_part())
+    
+    return msg
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """Check whether an SMTP error means the connection should be replaced."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        # 421: service not available, closing transmission channel
+        return error.smtp_code == 421
+    return isinstance(error, (ConnectionError, socket.timeout))
+
+
+class SMTPSession:
+    """Reusable SMTP connection that reconnects on failure."""
+    
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: Optional[bool] = None,
+        timeout: float = 30.0,
+        max_messages_per_connection: int = 100,
+        max_retries: int = 2
+    ):
+        """
+        Args:
+            host (str, optional): SMTP host. Defaults to SMTP_HOST
+            port (int, optional): SMTP port. Defaults to SMTP_PORT
+            user (str, optional): Login user. Defaults to SMTP_USER
+            password (str, optional): Login password. Defaults to SMTP_PASSWORD
+            use_tls (bool, optional): Run STARTTLS after connecting.
+                Defaults to SMTP_USE_TLS, which is on unless set to "false"
+            timeout (float): Socket timeout in seconds
+            max_messages_per_connection (int): Reconnect after this many
+                messages, since providers cap messages per connection
+            max_retries (int): Reconnect attempts when the connection drops
+        """
+        self.host = host or os.getenv("SMTP_HOST", "smtp.gmail.com")
+        self.port = port or int(os.getenv("SMTP_PORT", "587"))
+        self.user = user or os.getenv("SMTP_USER")
+        self.password = password or os.getenv("SMTP_PASSWORD")
+        if use_tls is None:
+            use_tls = os.getenv("SMTP_USE_TLS", "true").lower() not in ("0", "false", "no")
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_messages_per_connection = max_messages_per_connection
+        self.max_retries = max_retries
+        
+        self.connections = 0
+        self.messages_sent = 0
+        self._server: Optional[smtplib.SMTP] = None
+        self._sent_on_connection = 0
+    
+    def connect(self):
+        """Open the connection, run STARTTLS and log in."""
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        
+        self._server = server
+        self._sent_on_connection = 0
+        self.connections += 1
+    
+    def _discard(self):
+        """Drop the current connection without waiting on the server."""
+        if self._server is not None:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+        self._server = None
+    
+    def send(self, msg: MIMEMultipart):
+        """
+        Send a message, reconnecting if the connection was lost.
+        
+        Raises:
+            smtplib.SMTPException: If sending still fails after retries
+        """
+        for attempt in range(self.max_retries + 1):
+            if self._server is not None and self._sent_on_connection >= self.max_messages_per_connection:
+                self.close()
+            try:
+                if self._server is None:
+                    self.connect()
+                self._server.send_message(msg)
+                self._sent_on_connection += 1
+                self.messages_sent += 1
+                return
+            except Exception as e:
+                if _is_connection_error(e):
+                    self._discard()
+                    if attempt < self.max_retries:
+                        continue
+                raise
+    
+    def close(self):
+        """Quit the connection if it is open."""
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+        self._server = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+class SMTPPool:
+    """A few SMTP sessions shared by worker threads for bulk sends."""
+    
+    def __init__(
+        self,
+        size: int = 4,
+        attachment_cache: Optional[AttachmentCache] = None,
+        **session_kwargs
+    ):
+        """
+        Args:
+            size (int): Number of parallel connections
+            attachment_cache (AttachmentCache, optional): Shared cache of
+                encoded attachments. One is created if not given
+            **session_kwargs: Passed to each SMTPSession
+        """
+        self.size = size
+        self.attachment_cache = attachment_cache or AttachmentCache()
+        self._all_sessions = [SMTPSession(**session_kwargs) for _ in range(size)]
+        self._idle: queue.Queue = queue.Queue()
+        for smtp_session in self._all_sessions:
+            self._idle.put(smtp_session)
+    
+    @property
+    def connections(self) -> int:
+        """Total connections opened by the pool so far."""
+        return sum(smtp_session.connections for smtp_session in self._all_sessions)
+    
+    @contextmanager
+    def session(self):
+        """Borrow an idle session."""
+        smtp_session = self._idle.get()
+        try:
+            yield smtp_session
+        finally:
+            self._idle.put(smtp_session)
+    
+    def send_message(self, message: Dict[str, Any]) -> bool:
+        """
+        Send one message given as send_email() keyword arguments.
+        
+        Returns:
+            bool: True if successful
+        """
+        try:
+            with self.session() as smtp_session:
+                msg = build_message(
+                    from_email=message.get("from_email") or smtp_session.user,
+                    attachment_cache=self.attachment_cache,
+                    **{key: value for key, value in message.items() if key != "from_email"}
+                )
+                smtp_session.send(msg)
+            return True
+        except Exception as e:
+            print(f"Error sending email to {message.get('to')}: {e}")
+            return False
+    
+    def send_bulk(self, messages: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Send many messages over the pooled connections.
+        
+        Args:
+            messages (list): Dicts of send_email() keyword arguments
+        
+        Returns:
+            list: True/False per message, in the same order
+        """
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(self.send_message, messages))
+    
+    def close(self):
+        """Close every session."""
+        for smtp_session in self._all_sessions:
+            smtp_session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+def send_email_smtp(
+    to: str,
+    subject: str,
+    body: str,
+    html: bool = False,
+    from_email: Optional[str] = None,
+    attachments: Optional[List[str]] = None,
+    template_vars: Optional[Dict[str, str]] = None
+) -> bool:
+    """
+    Send email using SMTP.
+    
+    Args:
+        to (str): Recipient email
+        subject (str): Email subject
+        body (str): Email body
+        html (bool): Whether body is HTML
+        from_email (str, optional): Sender email
+        attachments (list, optional): List of file paths to attach
+        template_vars (dict, optional): Variables to replace in template
+    
+    Returns:
+        bool: True if successful
+    """
+    smtp_user = os.getenv("SMTP_USER")
+    smtp_password = os.getenv("SMTP_PASSWORD")
+    
+    if not smtp_user or not smtp_password:
+        print("Error: SMTP_USER and SMTP_PASSWORD must be set in .env")
+        return False
+    
+    msg = build_message(
+        to=to,
+        subject=subject,
+        body=body,
+        from_email=from_email or smtp_user,
+        html=html,
+        attachments=attachments,
+        template_vars=template_vars
+    )
     
     try:
         # Send email
-        server = smtplib.SMTP(smtp_host, smtp_port)
-        server.starttls()
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
+        with SMTPSession(max_retries=0) as smtp_session:
+            smtp_session.send(msg)
         
         print(f"Email sent successfully to {to}")
         return True
-        
+    
     except Exception as e:
         print(f"Error sending email: {e}")
         return False
@@ -138,6 +543,469 @@ def send_email(
     )
 
 
+def send_bulk(messages: List[Dict[str, Any]], connections: int = 4) -> List[bool]:
+    """
+    Send many emails, reusing a few SMTP connections.
+    
+    Args:
+        messages (list): Dicts of send_email() keyword arguments
+        connections (int): Number of parallel SMTP connections
+    
+    Returns:
+        list: True/False per message, in the same order
+    """
+    if not os.getenv("SMTP_USER") or not os.getenv("SMTP_PASSWORD"):
+        print("Error: SMTP_USER and SMTP_PASSWORD must be set in .env")
+        return [False] * len(messages)
+    
+    with SMTPPool(size=connections) as pool:
+        results = pool.send_bulk(messages)
+    
+    print(f"Sent {sum(results)}/{len(results)} emails using {pool.connections} connections")
+    return results
+
+
+def _is_permanent_error(error: Exception) -> bool:
+    """
+    Check whether the server rejected the message itself, so retrying it
+    can't succeed: refused recipients, or a 5xx for the sender or the data.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+def _is_provider_error(error: Exception) -> bool:
+    """
+    Check whether sending failed because of the provider (login, TLS,
+    connection) rather than the message, so every message would fail alike.
+    """
+    if isinstance(error, (
+        smtplib.SMTPAuthenticationError,
+        smtplib.SMTPHeloError,
+        smtplib.SMTPNotSupportedError,
+        smtplib.SMTPConnectError
+    )):
+        return True
+    if _is_connection_error(error):
+        return True
+    # Socket and TLS errors; smtplib's own errors are OSErrors too
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class _TokenBucket:
+    """Token bucket that reports how long to wait instead of sleeping."""
+    
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Args:
+            rate (float): Messages per second
+            burst (float, optional): Bucket size. Defaults to one second of rate
+        """
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+    
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class MailOutbox:
+    """
+    Durable outbound mail queue backed by SQLite.
+    
+    enqueue() only writes a row and returns; worker threads deliver queued
+    messages at each provider's rate, retry failures with exponential backoff
+    and move messages that keep failing to a dead-letter state. Messages that
+    were being sent when the process stopped are retried on the next start.
+    """
+    
+    def __init__(
+        self,
+        db_path: str = "outbox.db",
+        workers: int = 2,
+        rate: float = 5.0,
+        max_attempts: int = 5,
+        backoff: float = 30.0,
+        max_backoff: float = 3600.0,
+        attachment_cache: Optional[AttachmentCache] = None,
+        **session_kwargs
+    ):
+        """
+        Args:
+            db_path (str): SQLite file for the queue
+            workers (int): Delivery threads
+            rate (float): Messages per second for the default provider
+            max_attempts (int): Attempts before a message is dead-lettered
+            backoff (float): Delay in seconds before the first retry; doubles
+                on each further attempt
+            max_backoff (float): Longest delay between attempts
+            attachment_cache (AttachmentCache, optional): Shared cache of
+                encoded attachments. One is created if not given
+            **session_kwargs: SMTPSession options for the default provider
+        """
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.attachment_cache = attachment_cache or AttachmentCache()
+        
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        
+        # provider name -> (SMTPSession kwargs, rate limiter)
+        self._providers: Dict[str, Tuple[Dict[str, Any], _TokenBucket]] = {}
+        # provider name -> (consecutive provider failures, paused until)
+        self._provider_backoff: Dict[str, Tuple[int, float]] = {}
+        self.add_provider("default", rate=rate, **session_kwargs)
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+        
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "provider TEXT NOT NULL, "
+                "payload TEXT NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'pending', "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt_at REAL NOT NULL, "
+                "last_error TEXT, "
+                "created_at REAL NOT NULL, "
+                "sent_at REAL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outbox_due "
+                "ON outbox (status, next_attempt_at)"
+            )
+            # Finds each provider's next due message
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outbox_provider "
+                "ON outbox (status, provider, next_attempt_at)"
+            )
+            # Restart recovery: a send that was in flight may not have completed
+            self._connection.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+    
+    def add_provider(self, name: str, rate: float = 5.0, burst: Optional[float] = None, **session_kwargs):
+        """
+        Register an SMTP provider with its own rate limit. Register every
+        provider with queued mail before start(); mail queued earlier for a
+        provider that is missing then is dead-lettered.
+        
+        Args:
+            name (str): Provider name used in enqueue()
+            rate (float): Messages per second
+            burst (float, optional): Messages allowed at once after idling
+            **session_kwargs: SMTPSession options (host, port, user, ...)
+        """
+        with self._condition:
+            self._providers[name] = (session_kwargs, _TokenBucket(rate, burst))
+            self._condition.notify_all()
+    
+    def enqueue(self, provider: str = "default", **message) -> int:
+        """
+        Queue an email for background delivery.
+        
+        Args:
+            provider (str): Provider to send through
+            **message: send_email() keyword arguments
+        
+        Returns:
+            int: Message id
+        """
+        now = time.time()
+        with self._condition:
+            if provider not in self._providers:
+                raise ValueError(f"Unknown provider: {provider}")
+            with self._connection:
+                cursor = self._connection.execute(
+                    "INSERT INTO outbox (provider, payload, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (provider, json.dumps(message), now, now)
+                )
+            self._condition.notify()
+        return cursor.lastrowid
+    
+    def _claim(self) -> Tuple[Optional[tuple], Optional[float]]:
+        """
+        Mark the next deliverable message as sending. Caller holds the lock.
+        
+        Returns:
+            tuple: (row or None, seconds to wait before trying again, or None
+            to wait until a message is enqueued)
+        """
+        now = time.time()
+        ready = []
+        shortest = None
+        for name, (_, bucket) in self._providers.items():
+            next_due = self._connection.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending' AND provider = ?",
+                (name,)
+            ).fetchone()[0]
+            if next_due is None:
+                # Tokens of a provider with nothing queued don't help anyone
+                continue
+            _, paused_until = self._provider_backoff.get(name, (0, 0.0))
+            wait = max(next_due - now, bucket.wait_time(), paused_until - now)
+            if wait <= 0:
+                ready.append(name)
+            else:
+                shortest = wait if shortest is None else min(shortest, wait)
+        
+        if ready:
+            placeholders = ", ".join("?" for _ in ready)
+            row = self._connection.execute(
+                "SELECT id, provider, payload, attempts FROM outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? "
+                f"AND provider IN ({placeholders}) "
+                "ORDER BY next_attempt_at, id LIMIT 1",
+                (now, *ready)
+            ).fetchone()
+            if row:
+                with self._connection:
+                    self._connection.execute("UPDATE outbox SET status = 'sending' WHERE id = ?", (row[0],))
+                self._providers[row[1]][1].take()
+                return row, 0.0
+        # None when nothing is queued; enqueue() wakes the workers
+        return None, shortest
+    
+    def _dead_letter_unknown(self):
+        """
+        Dead-letter queued mail for providers that aren't registered, e.g.
+        left by an earlier run with a different configuration. Caller holds
+        the lock.
+        """
+        names = list(self._providers)
+        placeholders = ", ".join("?" for _ in names)
+        unknown = self._connection.execute(
+            f"SELECT DISTINCT provider FROM outbox WHERE status = 'pending' AND provider NOT IN ({placeholders})",
+            names
+        ).fetchall()
+        for (provider,) in unknown:
+            with self._connection:
+                cursor = self._connection.execute(
+                    "UPDATE outbox SET status = 'dead', last_error = ? WHERE status = 'pending' AND provider = ?",
+                    (f"Unknown provider: {provider}", provider)
+                )
+            print(f"Dead-lettered {cursor.rowcount} queued emails for unknown provider: {provider}")
+    
+    def _finish(self, message_id: int, provider: str, attempts: int, error: Optional[Exception]):
+        """Record the outcome of one delivery attempt."""
+        now = time.time()
+        with self._lock, self._connection:
+            if error is None:
+                self._provider_backoff.pop(provider, None)
+                self._connection.execute(
+                    "UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ?, last_error = NULL "
+                    "WHERE id = ?",
+                    (attempts, now, message_id)
+                )
+            elif attempts >= self.max_attempts or _is_permanent_error(error):
+                self._connection.execute(
+                    "UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, str(error), message_id)
+                )
+            else:
+                delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+                delay *= random.uniform(0.8, 1.2)
+                self._connection.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = ?, last_error = ?, "
+                    "next_attempt_at = ? WHERE id = ?",
+                    (attempts, str(error), now + delay, message_id)
+                )
+    
+    def _provider_failed(self, message_id: int, provider: str, error: Exception):
+        """
+        Put a message back without charging it an attempt and pause its
+        provider with exponential backoff, e.g. after a failed login.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            failures = self._provider_backoff.get(provider, (0, 0.0))[0] + 1
+            delay = min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+            delay *= random.uniform(0.8, 1.2)
+            self._provider_backoff[provider] = (failures, now + delay)
+            self._connection.execute(
+                "UPDATE outbox SET status = 'pending', last_error = ? WHERE id = ?",
+                (str(error), message_id)
+            )
+        print(f"Provider {provider} failed ({error}); pausing it for {delay:.1f}s")
+    
+    def _work(self):
+        # Each worker keeps one open connection per provider
+        sessions: Dict[str, SMTPSession] = {}
+        try:
+            while not self._stopped.is_set():
+                with self._condition:
+                    row, wait = self._claim()
+                    if row is None:
+                        self._condition.wait(wait)
+                        continue
+                
+                message_id, provider, payload, attempts = row
+                if provider not in sessions:
+                    sessions[provider] = SMTPSession(**self._providers[provider][0])
+                smtp_session = sessions[provider]
+                
+                error = None
+                try:
+                    message = json.loads(payload)
+                    msg = build_message(
+                        from_email=message.pop("from_email", None) or smtp_session.user,
+                        attachment_cache=self.attachment_cache,
+                        **message
+                    )
+                except Exception as e:
+                    error = e
+                else:
+                    try:
+                        smtp_session.send(msg)
+                    except Exception as e:
+                        if _is_provider_error(e):
+                            self._provider_failed(message_id, provider, e)
+                            continue
+                        error = e
+                self._finish(message_id, provider, attempts + 1, error)
+        finally:
+            for smtp_session in sessions.values():
+                smtp_session.close()
+    
+    def start(self):
+        """Start the delivery workers."""
+        with self._condition:
+            self._dead_letter_unknown()
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self):
+        """Stop the workers after their current message. Queued mail stays queued."""
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+    
+    def close(self):
+        """Stop the workers and close the database."""
+        self.stop()
+        with self._lock:
+            self._connection.close()
+    
+    def status(self, window: float = 60.0) -> Dict[str, Any]:
+        """
+        Report queue depth and throughput.
+        
+        Args:
+            window (float): Seconds over which throughput is measured
+        
+        Returns:
+            dict: Message counts per status, sent_per_second and
+            oldest_pending_age in seconds
+        """
+        now = time.time()
+        with self._lock:
+            counts = dict(self._connection.execute(
+                "SELECT status, COUNT(*) FROM outbox GROUP BY status"
+            ).fetchall())
+            recent = self._connection.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = 'sent' AND sent_at >= ?",
+                (now - window,)
+            ).fetchone()[0]
+            oldest = self._connection.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+        
+        return {
+            "pending": counts.get("pending", 0),
+            "sending": counts.get("sending", 0),
+            "sent": counts.get("sent", 0),
+            "dead": counts.get("dead", 0),
+            "sent_per_second": recent / window,
+            "oldest_pending_age": now - oldest if oldest else 0.0
+        }
+    
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return dead-lettered messages with their last error."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, provider, payload, attempts, last_error FROM outbox "
+                "WHERE status = 'dead' ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {
+                "id": message_id,
+                "provider": provider,
+                "message": json.loads(payload),
+                "attempts": attempts,
+                "last_error": last_error
+            }
+            for message_id, provider, payload, attempts, last_error in rows
+        ]
+    
+    def requeue_dead(self, ids: Optional[List[int]] = None) -> int:
+        """
+        Move dead-lettered messages back to the queue.
+        
+        Args:
+            ids (list, optional): Message ids. Defaults to all dead messages
+        
+        Returns:
+            int: Number of messages requeued
+        """
+        query = "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'dead'"
+        params: List[Any] = [time.time()]
+        if ids is not None:
+            query += f" AND id IN ({', '.join('?' for _ in ids)})"
+            params.extend(ids)
+        
+        with self._condition:
+            with self._connection:
+                count = self._connection.execute(query, params).rowcount
+            self._condition.notify_all()
+        return count
+    
+    def purge_sent(self, older_than: float = 86400.0) -> int:
+        """Delete sent messages older than the given number of seconds."""
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?",
+                (time.time() - older_than,)
+            ).rowcount
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
 if __name__ == "__main__":
     # Example usage
     send_email(
@@ -146,4 +1014,3 @@ if __name__ == "__main__":
         body="This is a test email from Python!",
         template_vars={"name": "Test User"}
     )
-
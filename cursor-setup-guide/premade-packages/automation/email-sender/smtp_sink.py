@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+SMTP Sink
+Local SMTP server that accepts and discards mail, for tests and benchmarks.
+"""
+
+import random
+import socketserver
+import threading
+import time
+from typing import List, Optional
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Speak just enough SMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, QUIT."""
+    
+    def reply(self, *lines: str):
+        if self.server.sink.latency:
+            time.sleep(self.server.sink.latency)
+        # One write per reply so multi-line replies aren't split by Nagle
+        self.wfile.write(b"".join(line.encode("ascii") + b"\r\n" for line in lines))
+    
+    def handle(self):
+        sink = self.server.sink
+        sink._count("connections")
+        self.reply("220 localhost SMTP sink ready")
+        
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            
+            if verb in ("EHLO", "HELO"):
+                sink._count("handshakes")
+                if verb == "EHLO":
+                    self.reply("250-localhost", "250-8BITMIME", "250 AUTH PLAIN LOGIN")
+                else:
+                    self.reply("250 localhost")
+            elif verb == "AUTH":
+                sink._count("logins")
+                if command.upper().startswith("AUTH LOGIN"):
+                    # Username and password prompts
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                if sink._roll(sink.disconnect_rate):
+                    # Simulate the server dropping the connection
+                    sink._count("disconnects")
+                    return
+                self.reply("250 2.1.0 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk == b".\r\n":
+                        break
+                    data.append(chunk)
+                if sink._roll(sink.fail_rate):
+                    sink._count("failures")
+                    self.reply("451 4.3.0 Temporary failure (injected)")
+                else:
+                    sink._accept(b"".join(data))
+                    self.reply("250 2.0.0 Queued")
+            elif verb == "QUIT":
+                self.reply("221 2.0.0 Bye")
+                return
+            else:
+                # RCPT, RSET, NOOP and anything else
+                self.reply("250 OK")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    Local SMTP server with configurable latency and failure injection.
+    
+    Usage:
+        with SMTPSink(latency=0.005, fail_rate=0.01) as sink:
+            # point SMTP_HOST/SMTP_PORT at sink.host/sink.port
+            ...
+            print(sink.stats())
+    """
+    
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        disconnect_rate: float = 0.0,
+        keep_messages: bool = False,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on. 0 picks a free port
+            latency (float): Seconds to wait before every reply
+            fail_rate (float): Chance that a message is rejected with 451
+            disconnect_rate (float): Chance that the connection is dropped
+                when a message starts
+            keep_messages (bool): Keep raw messages in self.messages
+            seed (int, optional): Seed for failure injection
+        """
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.disconnect_rate = disconnect_rate
+        self.keep_messages = keep_messages
+        self.messages: List[bytes] = []
+        
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counts = {
+            "connections": 0,
+            "handshakes": 0,
+            "logins": 0,
+            "accepted": 0,
+            "failures": 0,
+            "disconnects": 0
+        }
+        
+        self._server = _Server((host, port), _SinkHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+    
+    def _count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+    
+    def _roll(self, rate: float) -> bool:
+        if not rate:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+    
+    def _accept(self, data: bytes):
+        with self._lock:
+            self._counts["accepted"] += 1
+            if self.keep_messages:
+                self.messages.append(data)
+    
+    def stats(self) -> dict:
+        """Return counters for connections, handshakes and messages."""
+        with self._lock:
+            return dict(self._counts)
+    
+    def reset(self):
+        """Zero the counters and drop kept messages."""
+        with self._lock:
+            for key in self._counts:
+                self._counts[key] = 0
+            self.messages.clear()
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+
+
+if __name__ == "__main__":
+    with SMTPSink(port=1025) as sink:
+        print(f"SMTP sink listening on {sink.host}:{sink.port}")
+        print("Press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"\nStats: {sink.stats()}")
@@ -4,12 +4,1579 @@ File Watcher
 Monitor directory for file changes and trigger events.
 """
 
+import os
+import re
 import time
+import errno
+import ctypes
+import select
+import struct
+import asyncio
+import queue
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-from typing import Optional, Callable
+from watchdog.events import (
+    FileSystemEventHandler,
+    FileCreatedEvent,
+    FileModifiedEvent,
+    FileDeletedEvent,
+    FileMovedEvent,
+    DirCreatedEvent,
+    DirDeletedEvent,
+    DirMovedEvent
+)
+from typing import Optional, Callable, Dict, Set, Tuple, List, Iterable, Iterator, Pattern, Union, AsyncIterator
 from pathlib import Path
 
+try:
+    from watchdog.observers.inotify_c import InotifyConstants, inotify_init, inotify_add_watch, inotify_rm_watch
+except Exception:
+    # Not Linux, or libc without inotify; Watcher falls back to watchdog's Observer
+    inotify_init = None
+
+
+# Change types delivered to batch callbacks
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+# Patterns for trees that are rarely worth watching
+COMMON_EXCLUDES = [
+    ".git/",
+    "node_modules/",
+    "__pycache__/",
+    ".venv/",
+    "venv/",
+    "build/",
+    "dist/",
+    "*.swp",
+    "*~",
+]
+
+if inotify_init is not None:
+    # Events InotifyObserver asks for on every watched directory
+    INOTIFY_MASK = (
+        InotifyConstants.IN_CREATE | InotifyConstants.IN_DELETE | InotifyConstants.IN_MODIFY
+        | InotifyConstants.IN_ATTRIB | InotifyConstants.IN_MOVED_FROM | InotifyConstants.IN_MOVED_TO
+        | InotifyConstants.IN_ONLYDIR | InotifyConstants.IN_DONT_FOLLOW | InotifyConstants.IN_EXCL_UNLINK
+    )
+
+
+def _coalesce(previous: Optional[str], current: str) -> Optional[str]:
+    """
+    Merge a new change into the change already pending for a path.
+    
+    Args:
+        previous (str, optional): Pending change type, if any
+        current (str): Incoming change type
+    
+    Returns:
+        str or None: Resulting change type, or None if the changes cancel out
+    """
+    if previous is None:
+        return current
+    if previous == CREATED:
+        # Created then deleted within one window never existed for the caller
+        return None if current == DELETED else CREATED
+    if previous == DELETED:
+        # Deleted then re-created is a replacement of the existing file
+        return MODIFIED if current == CREATED else current
+    return current
+
+
+class BatchTimer:
+    """
+    One thread that flushes any number of ChangeBatchers when they are due.
+    
+    Batchers share the timer's lock, so adding a change and checking
+    deadlines never take two locks in different orders.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        # Batchers with pending changes
+        self._active: Set["ChangeBatcher"] = set()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _wake(self, batcher: "ChangeBatcher"):
+        """Schedule a batcher that just received a change. Caller holds the lock."""
+        self._active.add(batcher)
+        self._condition.notify()
+    
+    def _forget(self, batcher: "ChangeBatcher"):
+        with self._condition:
+            self._active.discard(batcher)
+    
+    def _run(self):
+        """Flush each batcher once its quiet window (or max delay) has passed."""
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    now = time.monotonic()
+                    due = [batcher for batcher in self._active if batcher._deadline() <= now]
+                    if due:
+                        break
+                    if self._active:
+                        self._condition.wait(min(batcher._deadline() for batcher in self._active) - now)
+                    else:
+                        self._condition.wait()
+                
+                batches = []
+                for batcher in due:
+                    self._active.discard(batcher)
+                    batches.append((batcher, batcher._take()))
+            
+            # Callbacks run outside the lock, one batcher after another
+            for batcher, changes in batches:
+                if changes:
+                    batcher._deliver(changes)
+    
+    def stop(self):
+        """Stop the timer thread. Pending changes stay with their batchers."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+
+class ChangeBatcher:
+    """Coalesce file events per path and deliver them as batches."""
+    
+    def __init__(
+        self,
+        callback: Callable[[Set[Tuple[str, str]]], None],
+        debounce: float = 0.1,
+        max_delay: float = 2.0,
+        timer: Optional[BatchTimer] = None
+    ):
+        """
+        Args:
+            callback (callable): Receives a set of (change_type, path) tuples
+            debounce (float): Quiet period in seconds before a batch is flushed
+            max_delay (float): Maximum seconds a change may wait during
+                continuous activity
+            timer (BatchTimer, optional): Shared timer thread that flushes the
+                batches. Defaults to a private one
+        """
+        self.callback = callback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._owns_timer = timer is None
+        self._timer = timer or BatchTimer()
+        self._condition = self._timer._condition
+        self._pending: Dict[str, str] = {}
+        self._first_event = 0.0
+        self._last_event = 0.0
+    
+    def add(self, change: str, path: str):
+        """Record a change for a path."""
+        with self._condition:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_event = now
+            self._last_event = now
+            
+            merged = _coalesce(self._pending.get(path), change)
+            if merged is None:
+                self._pending.pop(path, None)
+            else:
+                self._pending[path] = merged
+            self._timer._wake(self)
+    
+    def _deadline(self) -> float:
+        """When the pending batch is due. Caller holds the lock."""
+        return min(self._last_event + self.debounce, self._first_event + self.max_delay)
+    
+    def _take(self) -> Set[Tuple[str, str]]:
+        """Remove and return all pending changes. Caller holds the lock."""
+        changes = {(change, path) for path, change in self._pending.items()}
+        self._pending.clear()
+        return changes
+    
+    def _deliver(self, changes: Set[Tuple[str, str]]):
+        try:
+            self.callback(changes)
+        except Exception as e:
+            # Keep the shared timer thread alive for the other batchers
+            print(f"Error in batch callback: {e}")
+    
+    def flush(self):
+        """Deliver pending changes immediately on the calling thread."""
+        with self._condition:
+            changes = self._take()
+        if changes:
+            self._deliver(changes)
+    
+    def stop(self):
+        """Stop flushing on the timer and deliver anything still pending."""
+        self._timer._forget(self)
+        if self._owns_timer:
+            self._timer.stop()
+        self.flush()
+
+
+def _glob_to_regex(glob: str) -> str:
+    """Translate a gitignore glob (without anchors) into a regex."""
+    parts = []
+    i = 0
+    while i < len(glob):
+        char = glob[i]
+        if char == "*":
+            if glob[i:i + 2] == "**":
+                if glob[i + 2:i + 3] == "/":
+                    # "**/" matches zero or more directories
+                    parts.append("(?:.*/)?")
+                    i += 3
+                else:
+                    parts.append(".*")
+                    i += 2
+                continue
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            close = glob.find("]", i + 1)
+            if close == -1:
+                parts.append(re.escape(char))
+            else:
+                group = glob[i + 1:close].replace("\\", "\\\\")
+                if group.startswith("!"):
+                    group = "^" + group[1:]
+                parts.append(f"[{group}]")
+                i = close + 1
+                continue
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return "".join(parts)
+
+
+def _compile_pattern(pattern: str) -> Optional[Tuple[bool, str, str]]:
+    """
+    Compile one gitignore-style pattern.
+    
+    Returns:
+        tuple or None: (negated, file_regex, directory_regex), or None for
+        blank lines and comments
+    """
+    pattern = pattern.strip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    
+    negated = pattern.startswith("!")
+    if negated:
+        pattern = pattern[1:]
+    
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    
+    # A slash anywhere but the end anchors the pattern to the root
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    
+    body = _glob_to_regex(pattern)
+    if not anchored:
+        body = "(?:.*/)?" + body
+    
+    # Anything below a matching directory matches too
+    file_regex = body + ("/.*" if directory_only else "(?:/.*)?")
+    directory_regex = body + "(?:/.*)?"
+    return negated, file_regex, directory_regex
+
+
+def _join_patterns(regexes: List[str]) -> Optional[Pattern]:
+    """Combine regexes into one alternation, or None if there are none."""
+    if not regexes:
+        return None
+    return re.compile("|".join(f"(?:{regex})" for regex in regexes))
+
+
+def _join_ordered(patterns: List[Tuple[bool, str]]) -> Optional[Tuple[Pattern, List[bool]]]:
+    """
+    Combine (negated, regex) pairs so that the last matching pattern wins.
+    
+    The alternation lists the patterns in reverse, each in its own group, and
+    fullmatch() takes the first alternative that matches, which is the last
+    pattern given. The pattern regexes only use non-capturing groups, so
+    match.lastindex identifies it.
+    
+    Returns:
+        tuple or None: (regex, negated flag per group), or None if there are
+        no patterns
+    """
+    if not patterns:
+        return None
+    ordered = patterns[::-1]
+    regex = re.compile("|".join(f"({pattern})" for _, pattern in ordered))
+    return regex, [negated for negated, _ in ordered]
+
+
+def _last_match_excludes(matcher: Optional[Tuple[Pattern, List[bool]]], relative: str) -> bool:
+    """Whether the last pattern matching a path is an exclude, not a negation."""
+    if matcher is None:
+        return False
+    regex, negated = matcher
+    match = regex.fullmatch(relative)
+    return match is not None and not negated[match.lastindex - 1]
+
+
+class PathFilter:
+    """
+    Gitignore-style include/exclude matcher compiled into single regexes.
+    
+    As in gitignore, the last exclude pattern that matches a path decides,
+    so ``!keep.log`` re-includes a file only when no later pattern excludes
+    it again.
+    """
+    
+    def __init__(
+        self,
+        root: str,
+        include: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None
+    ):
+        """
+        Args:
+            root (str): Watched directory that patterns are relative to
+            include (list, optional): Only files matching one of these are kept
+            exclude (list, optional): Files and directories to ignore.
+                Patterns starting with ``!`` re-include a path
+        """
+        self.root = root
+        self._prefix = root.rstrip(os.sep) + os.sep
+        
+        exclude_file, exclude_dir = [], []
+        for pattern in exclude or []:
+            compiled = _compile_pattern(pattern)
+            if compiled is None:
+                continue
+            negated, file_regex, dir_regex = compiled
+            exclude_file.append((negated, file_regex))
+            exclude_dir.append((negated, dir_regex))
+        
+        include_file = []
+        for pattern in include or []:
+            compiled = _compile_pattern(pattern)
+            if compiled is not None:
+                include_file.append(compiled[1])
+        
+        self._exclude_file = _join_ordered(exclude_file)
+        self._exclude_dir = _join_ordered(exclude_dir)
+        self._include_file = _join_patterns(include_file)
+    
+    def _relative(self, path: str) -> str:
+        """Return path relative to the root using forward slashes."""
+        if path.startswith(self._prefix):
+            path = path[len(self._prefix):]
+        if os.sep != "/":
+            path = path.replace(os.sep, "/")
+        return path
+    
+    def allows(self, path: str) -> bool:
+        """Check whether events for a file should reach the callbacks."""
+        relative = self._relative(path)
+        if _last_match_excludes(self._exclude_file, relative):
+            return False
+        if self._include_file and not self._include_file.fullmatch(relative):
+            return False
+        return True
+    
+    def allows_directory(self, path: str) -> bool:
+        """Check whether a directory should be watched at all."""
+        relative = self._relative(path)
+        return not _last_match_excludes(self._exclude_dir, relative)
+
+
+class _PolledTree:
+    """Scan state for one directory watched by IncrementalPollingObserver."""
+    
+    def __init__(
+        self,
+        handler: FileSystemEventHandler,
+        path: str,
+        recursive: bool,
+        path_filter: Optional[PathFilter],
+        file_scan_interval: float = 120.0
+    ):
+        self.handler = handler
+        self.path = path
+        self.recursive = recursive
+        self.path_filter = path_filter
+        self.file_scan_interval = file_scan_interval
+        self.ready = False
+        self.changes = 0
+        
+        self._dir_mtimes: Dict[str, int] = {}
+        self._subdirs: Dict[str, Set[str]] = {}
+        self._dir_files: Dict[str, Set[str]] = {}
+        # path -> (size, mtime_ns, inode)
+        self._files: Dict[str, Tuple[int, int, int]] = {}
+        self._cursor: Optional[Iterator[Tuple[bool, str]]] = None
+        # time.monotonic() value after which a pass also re-stats every file
+        self._file_scan_due = 0.0
+    
+    def _emit(self, event_class, path: str):
+        self.changes += 1
+        self.handler.dispatch(event_class(path))
+    
+    def initialize(self):
+        """Record the current tree without reporting anything."""
+        self._list(self.path, emit=False)
+        self._file_scan_due = time.monotonic() + self.file_scan_interval
+        self.ready = True
+    
+    def _list(self, directory: str, emit: bool) -> int:
+        """
+        Read one directory and diff its entries against the recorded state.
+        
+        Returns:
+            int: Number of stat calls made
+        """
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as iterator:
+                entries = list(iterator)
+        except OSError:
+            self._remove_directory(directory, emit)
+            return 1
+        
+        cost = 1 + len(entries)
+        files = set()
+        subdirs = set()
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive and (self.path_filter is None or self.path_filter.allows_directory(entry.path)):
+                        subdirs.add(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    if self.path_filter is not None and not self.path_filter.allows(entry.path):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+                    files.add(entry.path)
+                    old = self._files.get(entry.path)
+                    self._files[entry.path] = key
+                    if emit and old is None:
+                        self._emit(FileCreatedEvent, entry.path)
+                    elif emit and old != key:
+                        self._emit(FileModifiedEvent, entry.path)
+            except OSError:
+                continue
+        
+        old_files = self._dir_files.get(directory, set())
+        old_subdirs = self._subdirs.get(directory, set())
+        self._dir_mtimes[directory] = mtime_ns
+        self._dir_files[directory] = files
+        self._subdirs[directory] = subdirs
+        
+        for path in old_files - files:
+            self._files.pop(path, None)
+            if emit:
+                self._emit(FileDeletedEvent, path)
+        for subdir in old_subdirs - subdirs:
+            self._remove_directory(subdir, emit)
+        for subdir in subdirs - old_subdirs:
+            cost += self._list(subdir, emit)
+        return cost
+    
+    def _remove_directory(self, directory: str, emit: bool):
+        """Forget a directory subtree, reporting its files as deleted."""
+        self._dir_mtimes.pop(directory, None)
+        for subdir in self._subdirs.pop(directory, set()):
+            self._remove_directory(subdir, emit)
+        for path in self._dir_files.pop(directory, set()):
+            self._files.pop(path, None)
+            if emit:
+                self._emit(FileDeletedEvent, path)
+    
+    def _cycle(self) -> Iterator[Tuple[bool, str]]:
+        """
+        Yield (is_directory, path) for one pass over the tree.
+        
+        A pass stats every directory, and _list() re-stats the entries of
+        those whose mtime changed. Files edited in place don't change their
+        directory's mtime, so every file_scan_interval seconds a pass also
+        re-stats each file.
+        """
+        scan_files = time.monotonic() >= self._file_scan_due
+        if scan_files:
+            self._file_scan_due = time.monotonic() + self.file_scan_interval
+        for directory in list(self._dir_mtimes):
+            yield True, directory
+        if scan_files:
+            for path in list(self._files):
+                yield False, path
+    
+    def _check_directory(self, directory: str) -> int:
+        if directory not in self._dir_mtimes:
+            return 0
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            if directory == self.path:
+                self._remove_directory(directory, emit=True)
+            # Otherwise the parent's listing picks up the removal
+            return 1
+        if mtime_ns == self._dir_mtimes[directory]:
+            # Entries unchanged; in-place edits are caught by the file scan
+            return 1
+        return self._list(directory, emit=True)
+    
+    def _check_file(self, path: str):
+        old = self._files.get(path)
+        if old is None:
+            return 0
+        try:
+            stat = os.stat(path, follow_symlinks=False)
+        except OSError:
+            self._files.pop(path, None)
+            self._dir_files.get(os.path.dirname(path), set()).discard(path)
+            self._emit(FileDeletedEvent, path)
+            return 1
+        key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        if key != old:
+            self._files[path] = key
+            self._emit(FileModifiedEvent, path)
+        return 1
+    
+    def sweep(self, max_stats: int, deadline: float) -> Tuple[int, bool]:
+        """
+        Continue the current pass until a budget runs out.
+        
+        Args:
+            max_stats (int): Maximum stat calls to make
+            deadline (float): time.monotonic() value to stop at
+        
+        Returns:
+            tuple: (stat calls made, whether the pass finished)
+        """
+        if self._cursor is None:
+            self._cursor = self._cycle()
+        
+        cost = 0
+        for is_directory, path in self._cursor:
+            cost += self._check_directory(path) if is_directory else self._check_file(path)
+            if cost >= max_stats or time.monotonic() >= deadline:
+                return cost, False
+        
+        self._cursor = None
+        return cost, True
+
+
+class IncrementalPollingObserver:
+    """
+    Polling observer for network filesystems where inotify does not fire.
+    
+    A pass stats each directory and re-lists only those whose mtime changed,
+    so its cost grows with the number of directories, not files. Content
+    edited in place leaves the directory mtime alone and is only noticed by
+    a full file scan every file_scan_interval seconds. Each sweep stops when
+    its stat or time budget is used up, and the interval backs off while
+    nothing changes. Offers the same schedule/start/stop/join interface as
+    watchdog's Observer.
+    """
+    
+    def __init__(
+        self,
+        interval: float = 1.0,
+        max_interval: float = 30.0,
+        max_stats_per_sweep: int = 10000,
+        max_sweep_time: float = 0.5,
+        file_scan_interval: float = 120.0
+    ):
+        """
+        Args:
+            interval (float): Seconds between sweeps while changes are seen
+            max_interval (float): Longest interval when the tree is idle
+            max_stats_per_sweep (int): IO budget of stat calls per sweep
+            max_sweep_time (float): Time budget per sweep in seconds
+            file_scan_interval (float): Seconds between passes that re-stat
+                every file to catch in-place edits
+        """
+        self.interval = interval
+        self.max_interval = max_interval
+        self.max_stats_per_sweep = max_stats_per_sweep
+        self.max_sweep_time = max_sweep_time
+        self.file_scan_interval = file_scan_interval
+        
+        self._trees: List[_PolledTree] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._next = 0
+    
+    def schedule(
+        self,
+        handler: FileSystemEventHandler,
+        path: str,
+        recursive: bool = True,
+        path_filter: Optional[PathFilter] = None
+    ) -> _PolledTree:
+        """Start polling a directory. Returns a handle for unschedule()."""
+        tree = _PolledTree(handler, path, recursive, path_filter, self.file_scan_interval)
+        with self._lock:
+            self._trees.append(tree)
+        return tree
+    
+    def unschedule(self, watch: _PolledTree):
+        """Stop polling a directory."""
+        with self._lock:
+            if watch in self._trees:
+                self._trees.remove(watch)
+    
+    def unschedule_all(self):
+        """Stop polling all directories."""
+        with self._lock:
+            self._trees.clear()
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop_event.set()
+    
+    def join(self, timeout: Optional[float] = None):
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+    
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+    
+    def _sweep(self) -> Tuple[int, bool]:
+        """
+        Run one budgeted sweep across all trees.
+        
+        Returns:
+            tuple: (changes reported, whether every tree finished its pass)
+        """
+        with self._lock:
+            trees = list(self._trees)
+        if not trees:
+            return 0, True
+        
+        for tree in trees:
+            if not tree.ready:
+                tree.initialize()
+        
+        budget = self.max_stats_per_sweep
+        deadline = time.monotonic() + self.max_sweep_time
+        changes = 0
+        finished = True
+        
+        # Rotate the starting tree so one large tree can't starve the rest
+        self._next = (self._next + 1) % len(trees)
+        for tree in trees[self._next:] + trees[:self._next]:
+            if budget <= 0 or time.monotonic() >= deadline:
+                finished = False
+                break
+            tree.changes = 0
+            cost, done = tree.sweep(budget, deadline)
+            budget -= cost
+            changes += tree.changes
+            finished = finished and done
+        return changes, finished
+    
+    def _run(self):
+        interval = self.interval
+        while not self._stop_event.is_set():
+            changes, finished = self._sweep()
+            if changes:
+                interval = self.interval
+            elif finished:
+                interval = min(interval * 1.5, self.max_interval)
+            # Mid-pass sweeps continue at the base rate; the budget caps IO
+            self._stop_event.wait(interval if finished else self.interval)
+
+
+class _InotifyWatch:
+    """One directory scheduled on an InotifyObserver."""
+    
+    def __init__(
+        self,
+        handler: FileSystemEventHandler,
+        path: str,
+        recursive: bool,
+        path_filter: Optional[PathFilter]
+    ):
+        self.handler = handler
+        self.path = path
+        self.recursive = recursive
+        self.path_filter = path_filter
+        # Absolute form of path, used for the observer's directory map
+        self.root = os.path.abspath(path)
+        # Watch descriptors for the directories this watch covers
+        self.wds: Set[int] = set()
+    
+    def local(self, path: str) -> str:
+        """Translate an absolute path back to the form the root was given in."""
+        if path == self.root:
+            return self.path
+        if path.startswith(self.root.rstrip(os.sep) + os.sep):
+            return os.path.join(self.path, path[len(self.root.rstrip(os.sep)) + 1:])
+        return path
+    
+    def covers_directory(self, path: str) -> bool:
+        """Whether a subdirectory should be watched for this root."""
+        return self.recursive and (self.path_filter is None or self.path_filter.allows_directory(self.local(path)))
+
+
+class InotifyObserver:
+    """
+    Native observer that shares one inotify instance across every root.
+    
+    watchdog's Observer starts an emitter per scheduled directory, each with
+    its own threads and inotify instance, so many roots run into the
+    per-user instance limit. This observer uses a single inotify file
+    descriptor and a single reader thread however many roots are scheduled,
+    and never adds watches for directories the root's filter excludes.
+    Offers the same schedule/start/stop/join interface as watchdog's Observer.
+    """
+    
+    # Seconds an unpaired IN_MOVED_FROM waits for its IN_MOVED_TO
+    MOVE_TIMEOUT = 0.1
+    
+    def __init__(self):
+        if inotify_init is None:
+            raise OSError("inotify is not available on this platform")
+        self._fd = inotify_init()
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init failed")
+        # Written to by stop() to wake the reader thread
+        self._wake_read, self._wake_write = os.pipe()
+        
+        # Guards the maps below; reentrant so helpers can nest
+        self._lock = threading.RLock()
+        # watch descriptor -> absolute directory path, and the reverse
+        self._paths: Dict[int, str] = {}
+        self._wds: Dict[str, int] = {}
+        # watch descriptor -> watches that cover the directory
+        self._users: Dict[int, Set[_InotifyWatch]] = {}
+        # move cookie -> (time seen, watch descriptor, source path, is directory)
+        self._moves: Dict[int, Tuple[float, int, str, bool]] = {}
+        
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def schedule(
+        self,
+        handler: FileSystemEventHandler,
+        path: str,
+        recursive: bool = True,
+        path_filter: Optional[PathFilter] = None
+    ) -> _InotifyWatch:
+        """
+        Start watching a directory. Returns a handle for unschedule().
+        
+        Raises:
+            OSError: If the directory can't be watched or the system's
+                inotify watch limit is reached
+        """
+        watch = _InotifyWatch(handler, path, recursive, path_filter)
+        with self._lock:
+            if not self._add_watch(watch, watch.root):
+                raise OSError(f"Cannot watch {path}")
+            try:
+                self._add_tree(watch, watch.root, simulate=False)
+            except OSError:
+                self.unschedule(watch)
+                raise
+        return watch
+    
+    def unschedule(self, watch: _InotifyWatch):
+        """Stop watching a directory."""
+        with self._lock:
+            for wd in list(watch.wds):
+                self._release(wd, watch)
+    
+    def unschedule_all(self):
+        """Stop watching all directories."""
+        with self._lock:
+            watches = {watch for users in self._users.values() for watch in users}
+            for watch in watches:
+                self.unschedule(watch)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        if self._thread.is_alive():
+            # The reader closes the descriptors on its way out
+            os.write(self._wake_write, b"\0")
+        else:
+            self._close()
+    
+    def join(self, timeout: Optional[float] = None):
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+    
+    def _close(self):
+        os.close(self._fd)
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+    
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+    
+    def _add_watch(self, watch: _InotifyWatch, directory: str) -> bool:
+        """
+        Add one directory to a watch. Caller holds the lock.
+        
+        Returns:
+            bool: False if the directory has gone or can't be read
+        """
+        wd = inotify_add_watch(self._fd, os.fsencode(directory), INOTIFY_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, "inotify watch limit reached (see fs.inotify.max_user_watches)")
+            if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return False
+            raise OSError(error, os.strerror(error), directory)
+        
+        # Bind mounts can show one directory under two paths; the first wins
+        if wd not in self._paths:
+            self._paths[wd] = directory
+            self._wds[directory] = wd
+        self._users.setdefault(wd, set()).add(watch)
+        watch.wds.add(wd)
+        return True
+    
+    def _add_tree(self, watch: _InotifyWatch, top: str, simulate: bool) -> list:
+        """
+        Watch the subdirectories of top that the watch covers. Caller holds
+        the lock and has already added top itself.
+        
+        Args:
+            simulate (bool): Return created events for everything found, for
+                directories that appeared after the watch started
+        
+        Returns:
+            list: (handler, event) pairs to dispatch
+        """
+        events = []
+        if not watch.recursive:
+            return events
+        
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    entries = list(entries)
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if not watch.covers_directory(entry.path) or not self._add_watch(watch, entry.path):
+                        continue
+                    stack.append(entry.path)
+                    if simulate:
+                        events.append((watch.handler, DirCreatedEvent(watch.local(entry.path))))
+                elif simulate:
+                    events.append((watch.handler, FileCreatedEvent(watch.local(entry.path))))
+        return events
+    
+    def _release(self, wd: int, watch: _InotifyWatch):
+        """Drop a watch's use of a descriptor, removing it once unused. Caller holds the lock."""
+        watch.wds.discard(wd)
+        users = self._users.get(wd)
+        if users is None:
+            return
+        users.discard(watch)
+        if users:
+            return
+        del self._users[wd]
+        self._forget(wd)
+        inotify_rm_watch(self._fd, wd)
+    
+    def _forget(self, wd: int):
+        """Remove a descriptor from the directory maps. Caller holds the lock."""
+        directory = self._paths.pop(wd, None)
+        if directory is not None and self._wds.get(directory) == wd:
+            del self._wds[directory]
+        for watch in self._users.pop(wd, ()):
+            watch.wds.discard(wd)
+    
+    def _subtree(self, top: str) -> List[Tuple[str, int]]:
+        """(directory, descriptor) for top and every watched directory below it. Caller holds the lock."""
+        prefix = top.rstrip(os.sep) + os.sep
+        return [(directory, wd) for directory, wd in self._wds.items() if directory == top or directory.startswith(prefix)]
+    
+    def _run(self):
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        poller.register(self._wake_read, select.POLLIN)
+        try:
+            while not self._stopped:
+                # Wake up shortly while a move waits for its other half
+                timeout = self.MOVE_TIMEOUT * 1000 / 2 if self._moves else None
+                ready = {fd for fd, _ in poller.poll(timeout)}
+                if self._stopped:
+                    break
+                
+                data = b""
+                if self._fd in ready:
+                    try:
+                        data = os.read(self._fd, 64 * 1024)
+                    except InterruptedError:
+                        pass
+                with self._lock:
+                    events = self._parse(data)
+                    events += self._expire_moves(time.monotonic())
+                
+                for handler, event in events:
+                    try:
+                        handler.dispatch(event)
+                    except Exception as e:
+                        # Keep the shared reader thread alive for the other roots
+                        print(f"Error handling {event.event_type} event for {event.src_path}: {e}")
+        finally:
+            self._close()
+    
+    def _parse(self, data: bytes) -> list:
+        """Turn a buffer of inotify events into (handler, event) pairs. Caller holds the lock."""
+        events = []
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, cookie, length = struct.unpack_from("iIII", data, offset)
+            name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b"\0"))
+            offset += 16 + length
+            try:
+                events += self._event(wd, mask, cookie, name)
+            except OSError as e:
+                print(f"Error watching new directory: {e}")
+        return events
+    
+    def _event(self, wd: int, mask: int, cookie: int, name: str) -> list:
+        if mask & InotifyConstants.IN_Q_OVERFLOW:
+            print("inotify event queue overflowed; some changes were missed")
+            return []
+        if mask & InotifyConstants.IN_IGNORED:
+            # The directory was deleted or its watch removed
+            self._forget(wd)
+            return []
+        
+        directory = self._paths.get(wd)
+        if directory is None or not name:
+            return []
+        path = os.path.join(directory, name)
+        is_dir = bool(mask & InotifyConstants.IN_ISDIR)
+        
+        if mask & InotifyConstants.IN_MOVED_FROM:
+            self._moves[cookie] = (time.monotonic(), wd, path, is_dir)
+            return []
+        if mask & InotifyConstants.IN_MOVED_TO:
+            move = self._moves.pop(cookie, None)
+            if move is None:
+                # Moved in from outside every watched directory
+                return self._created(wd, path, is_dir)
+            return self._moved(move[1], move[2], wd, path, is_dir)
+        if mask & InotifyConstants.IN_CREATE:
+            return self._created(wd, path, is_dir)
+        if mask & InotifyConstants.IN_DELETE:
+            event_class = DirDeletedEvent if is_dir else FileDeletedEvent
+            return [(watch.handler, event_class(watch.local(path))) for watch in self._users.get(wd, ())]
+        if mask & (InotifyConstants.IN_MODIFY | InotifyConstants.IN_ATTRIB) and not is_dir:
+            return [(watch.handler, FileModifiedEvent(watch.local(path))) for watch in self._users.get(wd, ())]
+        return []
+    
+    def _created(self, wd: int, path: str, is_dir: bool) -> list:
+        events = []
+        for watch in list(self._users.get(wd, ())):
+            if not is_dir:
+                events.append((watch.handler, FileCreatedEvent(watch.local(path))))
+                continue
+            events.append((watch.handler, DirCreatedEvent(watch.local(path))))
+            if watch.covers_directory(path) and self._add_watch(watch, path):
+                # Files can land in a new directory before its watch exists
+                events += self._add_tree(watch, path, simulate=True)
+        return events
+    
+    def _deleted_outside(self, wd: int, path: str, is_dir: bool) -> list:
+        """A move out of every watched directory: report a delete and unwatch the tree."""
+        events = []
+        for watch in self._users.get(wd, ()):
+            event_class = DirDeletedEvent if is_dir else FileDeletedEvent
+            events.append((watch.handler, event_class(watch.local(path))))
+        if is_dir:
+            for _, sub_wd in self._subtree(path):
+                for watch in list(self._users.get(sub_wd, ())):
+                    self._release(sub_wd, watch)
+        return events
+    
+    def _expire_moves(self, now: float) -> list:
+        """Treat moves whose destination never showed up as deletes. Caller holds the lock."""
+        events = []
+        for cookie, (seen, wd, path, is_dir) in list(self._moves.items()):
+            if now - seen >= self.MOVE_TIMEOUT:
+                del self._moves[cookie]
+                events += self._deleted_outside(wd, path, is_dir)
+        return events
+    
+    def _moved(self, src_wd: int, src: str, dest_wd: int, dest: str, is_dir: bool) -> list:
+        if is_dir:
+            # Kernel watches follow the inode; only the paths change
+            for old, sub_wd in self._subtree(src):
+                new = dest + old[len(src):]
+                del self._wds[old]
+                self._wds[new] = sub_wd
+                if self._paths.get(sub_wd) == old:
+                    self._paths[sub_wd] = new
+        
+        events = []
+        src_watches = self._users.get(src_wd, set())
+        dest_watches = self._users.get(dest_wd, set())
+        for watch in list(src_watches | dest_watches):
+            in_src = watch in src_watches and (not is_dir or watch.covers_directory(src))
+            in_dest = watch in dest_watches and (not is_dir or watch.covers_directory(dest))
+            if not is_dir:
+                if in_src and in_dest:
+                    events.append((watch.handler, FileMovedEvent(watch.local(src), watch.local(dest))))
+                elif watch in src_watches:
+                    events.append((watch.handler, FileDeletedEvent(watch.local(src))))
+                else:
+                    events.append((watch.handler, FileCreatedEvent(watch.local(dest))))
+                continue
+            
+            if in_src and in_dest:
+                events.append((watch.handler, DirMovedEvent(watch.local(src), watch.local(dest))))
+                if watch in self._users.get(self._wds.get(dest), ()):
+                    events += self._sub_moves(watch, src, dest)
+                elif self._add_watch(watch, dest):
+                    # Created and renamed before its IN_CREATE was handled, so
+                    # it was never watched and its contents never reported
+                    events += self._add_tree(watch, dest, simulate=True)
+            elif in_src:
+                events.append((watch.handler, DirDeletedEvent(watch.local(src))))
+                # The tree left this root or its filter: stop watching it here
+                for _, sub_wd in self._subtree(dest):
+                    if watch in self._users.get(sub_wd, ()):
+                        self._release(sub_wd, watch)
+            elif in_dest:
+                events.append((watch.handler, DirCreatedEvent(watch.local(dest))))
+                if self._add_watch(watch, dest):
+                    events += self._add_tree(watch, dest, simulate=True)
+            elif watch in src_watches and watch in dest_watches:
+                # Neither side is watched below this level, e.g. a non-recursive root
+                events.append((watch.handler, DirMovedEvent(watch.local(src), watch.local(dest))))
+            elif watch in src_watches:
+                events.append((watch.handler, DirDeletedEvent(watch.local(src))))
+            else:
+                events.append((watch.handler, DirCreatedEvent(watch.local(dest))))
+        return events
+    
+    def _sub_moves(self, watch: _InotifyWatch, src: str, dest: str) -> list:
+        """Moved events for everything inside a moved directory, as watchdog reports them."""
+        events = []
+        stack = [dest]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    entries = list(entries)
+            except OSError:
+                continue
+            for entry in entries:
+                old = src + entry.path[len(dest):]
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if watch.covers_directory(entry.path):
+                        stack.append(entry.path)
+                        events.append((watch.handler, DirMovedEvent(watch.local(old), watch.local(entry.path))))
+                else:
+                    events.append((watch.handler, FileMovedEvent(watch.local(old), watch.local(entry.path))))
+        return events
+
+
+def _schedule_watches(
+    observer: Union[Observer, InotifyObserver, IncrementalPollingObserver],
+    handler: "FileChangeHandler",
+    path: str,
+    recursive: bool,
+    path_filter: Optional[PathFilter]
+) -> list:
+    """
+    Schedule handler for path with a single watch.
+    
+    InotifyObserver and IncrementalPollingObserver skip excluded subtrees
+    themselves. On watchdog's Observer every scheduled directory costs its
+    own emitter, so excluded subtrees are not split out into separate
+    watches there; the handler drops their events instead.
+    
+    Returns:
+        list: Watch handles for observer.unschedule()
+    """
+    if isinstance(observer, (InotifyObserver, IncrementalPollingObserver)):
+        return [observer.schedule(handler, path, recursive=recursive, path_filter=path_filter)]
+    return [observer.schedule(handler, path, recursive=recursive)]
+
+
+def _scan_tree(
+    root: str,
+    recursive: bool = True,
+    path_filter: Optional[PathFilter] = None
+) -> Iterator[Tuple[str, os.stat_result]]:
+    """Yield (path, stat) for every regular file under root using os.scandir."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and (path_filter is None or path_filter.allows_directory(entry.path)):
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            if path_filter is None or path_filter.allows(entry.path):
+                                yield entry.path, entry.stat(follow_symlinks=False)
+                    except OSError:
+                        # Removed while scanning
+                        continue
+        except OSError:
+            continue
+
+
+def _hash_file(path: str) -> Optional[str]:
+    """Return a content digest for path, or None if it can't be read."""
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class SnapshotIndex:
+    """On-disk index of file metadata used to catch up on missed changes."""
+    
+    def __init__(
+        self,
+        index_path: str,
+        root: str,
+        recursive: bool = True,
+        hash_contents: bool = False,
+        path_filter: Optional[PathFilter] = None,
+        save_interval: float = 5.0,
+        replay_existing: bool = False
+    ):
+        """
+        Args:
+            index_path (str): SQLite file that stores the index
+            root (str): Watched directory
+            recursive (bool): Include subdirectories
+            hash_contents (bool): Store a content hash for changed files so
+                later mtime-only changes are not reported as modified
+            path_filter (PathFilter, optional): Skip files the watcher ignores
+            save_interval (float): Seconds between writes of live updates
+            replay_existing (bool): On the first catch-up of a new index,
+                report every existing file as created. By default the first
+                catch-up only records the tree
+        """
+        self.root = root
+        self.recursive = recursive
+        self.hash_contents = hash_contents
+        self.path_filter = path_filter
+        self.save_interval = save_interval
+        self.replay_existing = replay_existing
+        
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(index_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "inode INTEGER, hash TEXT)"
+        )
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._connection.commit()
+        # Set once a scan was recorded, so an index seeded from an empty
+        # directory is not mistaken for a new one
+        self._seeded = self._connection.execute(
+            "SELECT 1 FROM meta WHERE key = 'seeded'"
+        ).fetchone() is not None
+        
+        # Contents are hashed on this thread, not the observer's
+        self._hash_queue: Optional[queue.Queue] = None
+        self._hasher: Optional[threading.Thread] = None
+        
+        # path -> (size, mtime_ns, inode, hash)
+        self._entries: Dict[str, Tuple[int, int, int, Optional[str]]] = {
+            row[0]: row[1:]
+            for row in self._connection.execute(
+                "SELECT path, size, mtime_ns, inode, hash FROM files"
+            )
+        }
+        # path -> new entry, or None for removal; written by save()
+        self._dirty: Dict[str, Optional[Tuple[int, int, int, Optional[str]]]] = {}
+        self._last_save = time.monotonic()
+    
+    def _compare(self, path: str, stat: os.stat_result) -> Optional[bool]:
+        """
+        Compare a file against its entry. Caller holds the lock.
+        
+        Returns:
+            bool or None: True if changed (the entry is updated), False if
+            unchanged, None if the contents must be hashed to decide; pass
+            the digest to _settle()
+        """
+        old = self._entries.get(path)
+        size, mtime_ns, inode = stat.st_size, stat.st_mtime_ns, stat.st_ino
+        if old is not None and old[:3] == (size, mtime_ns, inode):
+            return False
+        # Hashed lazily: only once a known file changes, never during the
+        # first scan of a tree
+        if self.hash_contents and old is not None:
+            return None
+        self._store(path, (size, mtime_ns, inode, None))
+        return True
+    
+    def _settle(self, path: str, stat: os.stat_result, digest: Optional[str]) -> bool:
+        """Finish a comparison that needed a content hash. Caller holds the lock."""
+        old = self._entries.get(path)
+        if old is None:
+            # Deleted while hashing; the delete was already recorded
+            return False
+        size = stat.st_size
+        entry = (size, stat.st_mtime_ns, stat.st_ino, digest)
+        self._store(path, entry)
+        # Same contents: only the metadata changed, so keep the entry quietly
+        return not (old[3] is not None and old[3] == digest and old[0] == size)
+    
+    def _changed(self, path: str, stat: os.stat_result) -> bool:
+        """Compare a file against its entry, hashing outside the lock if needed."""
+        with self._lock:
+            result = self._compare(path, stat)
+        if result is not None:
+            return result
+        digest = _hash_file(path)
+        with self._lock:
+            return self._settle(path, stat, digest)
+    
+    def _store(self, path: str, entry: Optional[Tuple[int, int, int, Optional[str]]]):
+        """Update one entry in memory and queue it for saving. Caller holds the lock."""
+        if entry is None:
+            self._entries.pop(path, None)
+        else:
+            self._entries[path] = entry
+        self._dirty[path] = entry
+    
+    def catch_up(self) -> Set[Tuple[str, str]]:
+        """
+        Diff the live tree against the index and update the index.
+        
+        Returns:
+            set: (change_type, path) tuples for changes made while not watching
+        """
+        with self._lock:
+            unseen = set(self._entries)
+        
+        changes = set()
+        for path, stat in _scan_tree(self.root, self.recursive, self.path_filter):
+            unseen.discard(path)
+            with self._lock:
+                existed = path in self._entries
+            if self._changed(path, stat):
+                changes.add((MODIFIED if existed else CREATED, path))
+        
+        with self._lock:
+            for path in unseen:
+                # Files created by live events during the scan are not in unseen
+                if path in self._entries and not os.path.lexists(path):
+                    self._store(path, None)
+                    changes.add((DELETED, path))
+            
+            if not self._seeded:
+                # A new index only records the tree: reporting every existing
+                # file as created would flood callbacks on a fresh deployment
+                if not self.replay_existing:
+                    changes = set()
+                self._seeded = True
+                with self._connection:
+                    self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seeded', '1')")
+        
+        self.save()
+        return changes
+    
+    def record(self, change: str, path: str, deliver: Optional[Callable[[str, str], None]] = None) -> bool:
+        """
+        Update the index for a live event.
+        
+        Args:
+            change (str): Change type
+            path (str): Changed file
+            deliver (callable, optional): Called with (change, path) from the
+                hashing thread if the contents have to be hashed and turn out
+                changed. Without it, hashing happens on the calling thread
+        
+        Returns:
+            bool: False if the event is a duplicate, the contents are
+            unchanged, or the decision was handed to the hashing thread
+        """
+        with self._lock:
+            if change == DELETED:
+                self._store(path, None)
+                self._maybe_save()
+                return True
+            try:
+                stat = os.stat(path, follow_symlinks=False)
+            except OSError:
+                # Already gone; the delete event will follow
+                return True
+            result = self._compare(path, stat)
+            if result is None and deliver is not None:
+                self._start_hasher()
+                self._hash_queue.put((change, path, stat, deliver))
+                return False
+            self._maybe_save()
+        if result is None:
+            return self._changed(path, stat)
+        return result
+    
+    def _maybe_save(self):
+        """Save if enough updates are pending. Caller holds the lock."""
+        if len(self._dirty) >= 1000 or time.monotonic() - self._last_save >= self.save_interval:
+            self._save()
+    
+    def _start_hasher(self):
+        """Start the hashing thread on first use. Caller holds the lock."""
+        if self._hasher is None:
+            self._hash_queue = queue.Queue()
+            self._hasher = threading.Thread(target=self._hash_loop, daemon=True)
+            self._hasher.start()
+    
+    def _hash_loop(self):
+        while True:
+            item = self._hash_queue.get()
+            if item is None:
+                return
+            change, path, stat, deliver = item
+            digest = _hash_file(path)
+            with self._lock:
+                changed = self._settle(path, stat, digest)
+                self._maybe_save()
+            if changed:
+                try:
+                    deliver(change, path)
+                except Exception as e:
+                    print(f"Error delivering change for {path}: {e}")
+    
+    def forget_tree(self, directory: str):
+        """Drop entries below a directory that was deleted or moved away."""
+        prefix = directory.rstrip(os.sep) + os.sep
+        with self._lock:
+            for path in [path for path in self._entries if path.startswith(prefix)]:
+                self._store(path, None)
+    
+    def _save(self):
+        """Write pending updates in one transaction. Caller holds the lock."""
+        if self._dirty:
+            upserts = [(path, *entry) for path, entry in self._dirty.items() if entry is not None]
+            deletes = [(path,) for path, entry in self._dirty.items() if entry is None]
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, hash) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    upserts
+                )
+                self._connection.executemany("DELETE FROM files WHERE path = ?", deletes)
+            self._dirty.clear()
+        self._last_save = time.monotonic()
+    
+    def save(self):
+        """Write pending updates to disk."""
+        with self._lock:
+            self._save()
+    
+    def close(self):
+        """Finish pending hashes, then save and close the index."""
+        if self._hasher is not None:
+            self._hash_queue.put(None)
+            self._hasher.join()
+        with self._lock:
+            self._save()
+            self._connection.close()
+
+
+class EventDispatcher:
+    """Run callbacks on worker threads or processes, in order per path."""
+    
+    def __init__(
+        self,
+        workers: int = 4,
+        use_processes: bool = False,
+        max_pending: int = 1000,
+        overflow: str = "block",
+        on_drop: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Args:
+            workers (int): Number of workers. Events for the same path always
+                go to the same worker, so they run in order
+            use_processes (bool): Run callbacks in a process pool. Callbacks
+                must then be picklable module-level functions
+            max_pending (int): Queue size per worker
+            overflow (str): "block" to make the observer wait when a queue is
+                full, or "drop" to discard the event
+            on_drop (callable, optional): Called with the path of each dropped
+                event. Defaults to printing a warning
+        """
+        if overflow not in ("block", "drop"):
+            raise ValueError("overflow must be 'block' or 'drop'")
+        
+        self.overflow = overflow
+        self.on_drop = on_drop
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "dropped": 0,
+            "overflows": 0
+        }
+        self._lock = threading.Lock()
+        # Pair submissions must reach both queues in the same order, or two
+        # moves could each wait for the other's barrier
+        self._pair_lock = threading.Lock()
+        self._queues = [queue.Queue(maxsize=max_pending) for _ in range(workers)]
+        self._pool = ProcessPoolExecutor(max_workers=workers) if use_processes else None
+        self._threads = [
+            threading.Thread(target=self._work, args=(work_queue,), daemon=True)
+            for work_queue in self._queues
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+    
+    def _queue_for(self, key: str) -> queue.Queue:
+        return self._queues[hash(key) % len(self._queues)]
+    
+    def _put(self, work_queue: queue.Queue, key: str, item: tuple) -> bool:
+        """Enqueue an item, applying the overflow policy. Returns False if dropped."""
+        try:
+            work_queue.put_nowait(item)
+        except queue.Full:
+            self._count("overflows")
+            if self.overflow == "drop":
+                self._count("dropped")
+                if self.on_drop:
+                    self.on_drop(key)
+                else:
+                    print(f"Warning: event queue full, dropped event for {key}")
+                return False
+            work_queue.put(item)
+        return True
+    
+    def submit(self, key: str, callback: Callable, *args) -> bool:
+        """
+        Queue a callback on the worker that owns key.
+        
+        Args:
+            key (str): Path used to pick the worker
+            callback (callable): Function to run
+            *args: Arguments for the callback
+        
+        Returns:
+            bool: False if the event was dropped
+        """
+        if not self._put(self._queue_for(key), key, (callback, args, None)):
+            return False
+        self._count("submitted")
+        return True
+    
+    def submit_paired(self, first: str, second: str, callback: Callable, *args) -> bool:
+        """
+        Queue a callback that must stay in order with events on two paths,
+        e.g. a move from first to second.
+        
+        The callback runs on second's worker. If first belongs to another
+        worker, that worker waits at a barrier until the callback has run, so
+        no earlier or later event on either path overtakes it.
+        
+        Returns:
+            bool: False if the event was dropped
+        """
+        first_queue = self._queue_for(first)
+        second_queue = self._queue_for(second)
+        if first_queue is second_queue:
+            return self.submit(second, callback, *args)
+        
+        # (reached by first's worker, callback finished)
+        gate = (threading.Event(), threading.Event())
+        with self._pair_lock:
+            if not self._put(first_queue, first, (None, (), gate)):
+                return False
+            if not self._put(second_queue, second, (callback, args, gate)):
+                # Release the barrier that is already queued
+                gate[1].set()
+                return False
+        self._count("submitted")
+        return True
+    
+    def _work(self, work_queue: queue.Queue):
+        while True:
+            item = work_queue.get()
+            if item is None:
+                return
+            
+            callback, args, gate = item
+            if callback is None:
+                # Barrier of a paired event: hold this worker until it ran
+                gate[0].set()
+                gate[1].wait()
+                continue
+            if gate is not None:
+                gate[0].wait()
+            try:
+                if self._pool:
+                    self._pool.submit(callback, *args).result()
+                else:
+                    callback(*args)
+            except Exception as e:
+                self._count("failed")
+                print(f"Error in file watcher callback: {e}")
+            else:
+                self._count("completed")
+            finally:
+                if gate is not None:
+                    gate[1].set()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Return counters plus the number of queued events."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["pending"] = sum(work_queue.qsize() for work_queue in self._queues)
+        return stats
+    
+    def stop(self):
+        """Finish queued events and stop the workers."""
+        for work_queue in self._queues:
+            work_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._pool:
+            self._pool.shutdown()
+
 
 class FileChangeHandler(FileSystemEventHandler):
     """Handle file system events."""
@@ -19,32 +1586,311 @@ class FileChangeHandler(FileSystemEventHandler):
         on_created: Optional[Callable] = None,
         on_modified: Optional[Callable] = None,
         on_deleted: Optional[Callable] = None,
-        on_moved: Optional[Callable] = None
+        on_moved: Optional[Callable] = None,
+        batcher: Optional[ChangeBatcher] = None,
+        path_filter: Optional[PathFilter] = None,
+        dispatcher: Optional[EventDispatcher] = None,
+        index: Optional[SnapshotIndex] = None
     ):
-        self.on_created = on_created
-        self.on_modified = on_modified
-        self.on_deleted = on_deleted
-        self.on_moved = on_moved
+        if batcher and dispatcher:
+            raise ValueError("dispatcher only runs per-event callbacks and can't be combined with on_batch")
+        # Stored under private names so they don't shadow the event methods
+        self._on_created = on_created
+        self._on_modified = on_modified
+        self._on_deleted = on_deleted
+        self._on_moved = on_moved
+        self.batcher = batcher
+        self.path_filter = path_filter
+        self.dispatcher = dispatcher
+        self.index = index
+    
+    def _allowed(self, path: str) -> bool:
+        return self.path_filter is None or self.path_filter.allows(path)
+    
+    def _dispatch(self, change: str, path: str):
+        # With hash_contents the index may decide later, on its own thread
+        if self.index and not self.index.record(change, path, self.deliver):
+            return
+        self.deliver(change, path)
+    
+    def deliver(self, change: str, path: str):
+        """Send a change to the batcher or callbacks without filtering."""
+        if self.batcher:
+            self.batcher.add(change, path)
+            return
+        callback = getattr(self, f"_on_{change}")
+        if callback:
+            self._run(path, callback, path)
+    
+    def _run(self, key: str, callback: Callable, *args):
+        if self.dispatcher:
+            self.dispatcher.submit(key, callback, *args)
+        else:
+            callback(*args)
     
     def on_created(self, event):
-        if not event.is_directory:
-            if self.on_created:
-                self.on_created(event.src_path)
+        if not event.is_directory and self._allowed(event.src_path):
+            self._dispatch(CREATED, event.src_path)
     
     def on_modified(self, event):
-        if not event.is_directory:
-            if self.on_modified:
-                self.on_modified(event.src_path)
+        if not event.is_directory and self._allowed(event.src_path):
+            self._dispatch(MODIFIED, event.src_path)
     
     def on_deleted(self, event):
-        if not event.is_directory:
-            if self.on_deleted:
-                self.on_deleted(event.src_path)
+        if event.is_directory:
+            if self.index:
+                self.index.forget_tree(event.src_path)
+        elif self._allowed(event.src_path):
+            self._dispatch(DELETED, event.src_path)
     
     def on_moved(self, event):
-        if not event.is_directory:
-            if self.on_moved:
-                self.on_moved(event.src_path, event.dest_path)
+        if event.is_directory:
+            if self.index:
+                self.index.forget_tree(event.src_path)
+            return
+        
+        src_allowed = self._allowed(event.src_path)
+        dest_allowed = self._allowed(event.dest_path)
+        if src_allowed and dest_allowed:
+            if self.index:
+                self.index.record(DELETED, event.src_path)
+                self.index.record(CREATED, event.dest_path)
+            if self.batcher:
+                # A move is reported as deleting the source and creating the
+                # destination so it coalesces with other events on either path
+                self.batcher.add(DELETED, event.src_path)
+                self.batcher.add(CREATED, event.dest_path)
+            elif self._on_moved:
+                if self.dispatcher:
+                    # Ordered against events on both the old and the new path
+                    self.dispatcher.submit_paired(
+                        event.src_path, event.dest_path, self._on_moved, event.src_path, event.dest_path
+                    )
+                else:
+                    self._on_moved(event.src_path, event.dest_path)
+        elif src_allowed:
+            # Moved out of the filtered set
+            self._dispatch(DELETED, event.src_path)
+        elif dest_allowed:
+            # Moved into the filtered set
+            self._dispatch(CREATED, event.dest_path)
+
+
+class Watcher:
+    """
+    Watch many directories with one shared observer.
+    
+    On Linux every root shares one inotify instance and reader thread
+    (InotifyObserver), and all batching roots share one BatchTimer thread,
+    so threads and file descriptors don't grow with the number of roots.
+    """
+    
+    def __init__(
+        self,
+        polling: bool = False,
+        poll_interval: float = 1.0,
+        max_poll_interval: float = 30.0,
+        max_stats_per_sweep: int = 10000,
+        file_scan_interval: float = 120.0
+    ):
+        """
+        Args:
+            polling (bool): Use IncrementalPollingObserver instead of native
+                events, e.g. on NFS/SMB mounts. Polls every root from a
+                single thread
+            poll_interval (float): Seconds between polling sweeps while busy
+            max_poll_interval (float): Longest polling interval while idle
+            max_stats_per_sweep (int): Stat calls allowed per polling sweep
+            file_scan_interval (float): Seconds between polling passes that
+                re-stat every file to catch in-place edits
+        """
+        if polling:
+            self.observer = IncrementalPollingObserver(
+                interval=poll_interval,
+                max_interval=max_poll_interval,
+                max_stats_per_sweep=max_stats_per_sweep,
+                file_scan_interval=file_scan_interval
+            )
+        elif inotify_init is not None:
+            self.observer = InotifyObserver()
+        else:
+            self.observer = Observer()
+        # Flushes the batches of every root
+        self._timer = BatchTimer()
+        
+        # root path -> (handler, watch handles)
+        self._roots: Dict[str, Tuple[FileChangeHandler, list]] = {}
+        self._lock = threading.Lock()
+        self._started = False
+    
+    @property
+    def roots(self) -> List[str]:
+        """Directories currently being watched."""
+        with self._lock:
+            return list(self._roots)
+    
+    def add(
+        self,
+        path: str,
+        on_created: Optional[Callable] = None,
+        on_modified: Optional[Callable] = None,
+        on_deleted: Optional[Callable] = None,
+        on_moved: Optional[Callable] = None,
+        recursive: bool = True,
+        on_batch: Optional[Callable[[Set[Tuple[str, str]]], None]] = None,
+        debounce: float = 0.1,
+        max_delay: float = 2.0,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        dispatcher: Optional[EventDispatcher] = None,
+        index_path: Optional[str] = None,
+        hash_contents: bool = False,
+        replay_existing: bool = False
+    ) -> str:
+        """
+        Start watching a directory. Can be called while the watcher runs.
+        
+        Takes the same options as watch_directory().
+        
+        Returns:
+            str: Root key to pass to remove()
+        """
+        root = str(path)
+        if on_batch and dispatcher:
+            # Checked before the index and batcher are created
+            raise ValueError("dispatcher only runs per-event callbacks and can't be combined with on_batch")
+        with self._lock:
+            if root in self._roots:
+                raise ValueError(f"Already watching {root}")
+        
+        path_obj = Path(root)
+        if not path_obj.exists():
+            print(f"Creating directory: {root}")
+            path_obj.mkdir(parents=True, exist_ok=True)
+        
+        path_filter = None
+        if include or exclude:
+            path_filter = PathFilter(root, include=include, exclude=exclude)
+        
+        batcher = None
+        if on_batch:
+            batcher = ChangeBatcher(on_batch, debounce=debounce, max_delay=max_delay, timer=self._timer)
+        
+        index = None
+        if index_path:
+            index = SnapshotIndex(
+                index_path,
+                root,
+                recursive=recursive,
+                hash_contents=hash_contents,
+                path_filter=path_filter,
+                replay_existing=replay_existing
+            )
+        
+        handler = FileChangeHandler(
+            on_created=on_created,
+            on_modified=on_modified,
+            on_deleted=on_deleted,
+            on_moved=on_moved,
+            batcher=batcher,
+            path_filter=path_filter,
+            dispatcher=dispatcher,
+            index=index
+        )
+        watches = _schedule_watches(self.observer, handler, root, recursive, path_filter)
+        
+        with self._lock:
+            self._roots[root] = (handler, watches)
+            started = self._started
+        
+        if started:
+            self._catch_up(handler)
+        return root
+    
+    def remove(self, path: str):
+        """Stop watching a directory and flush its pending changes."""
+        with self._lock:
+            handler, watches = self._roots.pop(str(path))
+        
+        for watch in list(watches):
+            try:
+                self.observer.unschedule(watch)
+            except KeyError:
+                # Already removed, e.g. the directory was deleted
+                pass
+        self._close(handler)
+    
+    def _catch_up(self, handler: FileChangeHandler):
+        """Report changes made while a root with an index was not watched."""
+        if not handler.index:
+            return
+        # Runs after the observer started so nothing is missed; the index
+        # suppresses events reported by both
+        changes = handler.index.catch_up()
+        print(f"Found {len(changes)} changes since last run in {handler.index.root}")
+        for change, changed_path in sorted(changes, key=lambda item: item[1]):
+            handler.deliver(change, changed_path)
+    
+    def _close(self, handler: FileChangeHandler):
+        """Stop the helpers owned by one root."""
+        if handler.batcher:
+            handler.batcher.stop()
+        if handler.dispatcher:
+            with self._lock:
+                shared = any(other.dispatcher is handler.dispatcher for other, _ in self._roots.values())
+            if not shared:
+                handler.dispatcher.stop()
+        if handler.index:
+            handler.index.close()
+    
+    def start(self):
+        """Start the shared observer."""
+        self.observer.start()
+        with self._lock:
+            self._started = True
+            handlers = [handler for handler, _ in self._roots.values()]
+        for handler in handlers:
+            self._catch_up(handler)
+    
+    def stop(self):
+        """Stop the observer and flush every root."""
+        self.observer.stop()
+        self.observer.join()
+        with self._lock:
+            roots = list(self._roots.values())
+            self._roots.clear()
+            self._started = False
+        
+        dispatchers = []
+        for handler, _ in roots:
+            if handler.dispatcher and handler.dispatcher not in dispatchers:
+                dispatchers.append(handler.dispatcher)
+            handler.dispatcher = None
+            self._close(handler)
+        for dispatcher in dispatchers:
+            dispatcher.stop()
+        self._timer.stop()
+    
+    def run_forever(self):
+        """Start watching and block until Ctrl+C."""
+        if not self._started:
+            self.start()
+        print("Press Ctrl+C to stop")
+        
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+        
+        self.stop()
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
 
 
 def watch_directory(
@@ -53,7 +1899,21 @@ def watch_directory(
     on_modified: Optional[Callable] = None,
     on_deleted: Optional[Callable] = None,
     on_moved: Optional[Callable] = None,
-    recursive: bool = True
+    recursive: bool = True,
+    on_batch: Optional[Callable[[Set[Tuple[str, str]]], None]] = None,
+    debounce: float = 0.1,
+    max_delay: float = 2.0,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    dispatcher: Optional[EventDispatcher] = None,
+    index_path: Optional[str] = None,
+    hash_contents: bool = False,
+    replay_existing: bool = False,
+    polling: bool = False,
+    poll_interval: float = 1.0,
+    max_poll_interval: float = 30.0,
+    max_stats_per_sweep: int = 10000,
+    file_scan_interval: float = 120.0
 ):
     """
     Watch a directory for file changes.
@@ -65,35 +1925,139 @@ def watch_directory(
         on_deleted (callable): Callback for file deletion
         on_moved (callable): Callback for file moves
         recursive (bool): Watch subdirectories
+        on_batch (callable, optional): Enables batching mode. Receives one set
+            of (change_type, path) tuples per quiet window instead of the
+            per-event callbacks above
+        debounce (float): Quiet period in seconds that ends a batch
+        max_delay (float): Longest a batch is held during continuous changes
+        include (list, optional): Gitignore-style patterns; only matching
+            files are reported
+        exclude (list, optional): Gitignore-style patterns to ignore.
+            Excluded directories are not watched at all (except on
+            platforms without inotify)
+        dispatcher (EventDispatcher, optional): Run per-event callbacks on a
+            worker pool instead of the observer thread. Stopped on exit.
+            Can't be combined with on_batch
+        index_path (str, optional): SQLite file for a persistent snapshot
+            index. Changes made while the watcher was not running are
+            reported on startup
+        hash_contents (bool): With an index, compare content hashes so
+            mtime-only changes are not reported as modified
+        replay_existing (bool): With a new index, report every existing file
+            as created on the first start instead of only recording them
+        polling (bool): Use IncrementalPollingObserver instead of native
+            events, e.g. on NFS/SMB mounts
+        poll_interval (float): Seconds between polling sweeps while busy
+        max_poll_interval (float): Longest polling interval while idle
+        max_stats_per_sweep (int): Stat calls allowed per polling sweep
+        file_scan_interval (float): Seconds between polling passes that
+            re-stat every file to catch in-place edits
     """
-    path_obj = Path(path)
-    
-    if not path_obj.exists():
-        print(f"Creating directory: {path}")
-        path_obj.mkdir(parents=True, exist_ok=True)
-    
-    event_handler = FileChangeHandler(
+    watcher = Watcher(
+        polling=polling,
+        poll_interval=poll_interval,
+        max_poll_interval=max_poll_interval,
+        max_stats_per_sweep=max_stats_per_sweep,
+        file_scan_interval=file_scan_interval
+    )
+    watcher.add(
+        path,
         on_created=on_created,
         on_modified=on_modified,
         on_deleted=on_deleted,
-        on_moved=on_moved
+        on_moved=on_moved,
+        recursive=recursive,
+        on_batch=on_batch,
+        debounce=debounce,
+        max_delay=max_delay,
+        include=include,
+        exclude=exclude,
+        dispatcher=dispatcher,
+        index_path=index_path,
+        hash_contents=hash_contents,
+        replay_existing=replay_existing
     )
     
-    observer = Observer()
-    observer.schedule(event_handler, str(path), recursive=recursive)
-    observer.start()
-    
     print(f"Watching directory: {path}")
-    print("Press Ctrl+C to stop")
+    watcher.run_forever()
+
+
+async def awatch(
+    path: str,
+    recursive: bool = True,
+    debounce: float = 0.1,
+    max_delay: float = 2.0,
+    max_queue: int = 16,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    polling: bool = False,
+    poll_interval: float = 1.0
+) -> AsyncIterator[Set[Tuple[str, str]]]:
+    """
+    Watch a directory from asyncio code.
+    
+    Yields the same coalesced change sets as batching mode. When the consumer
+    falls behind and the queue is full, the batcher waits and keeps merging
+    new events per path, so memory stays bounded by the number of changed
+    paths. Cancelling the consuming task or leaving the ``async for`` loop
+    stops the observer.
+    
+    Args:
+        path (str): Directory path to watch
+        recursive (bool): Watch subdirectories
+        debounce (float): Quiet period in seconds that ends a batch
+        max_delay (float): Longest a batch is held during continuous changes
+        max_queue (int): Maximum batches buffered for the consumer
+        include (list, optional): Gitignore-style patterns to report
+        exclude (list, optional): Gitignore-style patterns to ignore
+        polling (bool): Use IncrementalPollingObserver instead of native events
+        poll_interval (float): Seconds between polling sweeps while busy
+    
+    Yields:
+        set: (change_type, path) tuples
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+    lock = threading.Lock()
+    state = {"stopped": False, "pending": None}
+    
+    def deliver(changes):
+        # Runs on the batch timer thread; blocks until the loop accepts the batch
+        with lock:
+            if state["stopped"]:
+                return
+            future = asyncio.run_coroutine_threadsafe(queue.put(changes), loop)
+            state["pending"] = future
+        try:
+            future.result()
+        except Exception:
+            # Cancelled during shutdown or the loop has gone away
+            pass
+        finally:
+            with lock:
+                state["pending"] = None
+    
+    watcher = Watcher(polling=polling, poll_interval=poll_interval)
+    watcher.add(
+        path,
+        recursive=recursive,
+        on_batch=deliver,
+        debounce=debounce,
+        max_delay=max_delay,
+        include=include,
+        exclude=exclude
+    )
+    watcher.start()
     
     try:
         while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        observer.stop()
-        print("\nStopped watching")
-    
-    observer.join()
+            yield await queue.get()
+    finally:
+        with lock:
+            state["stopped"] = True
+            if state["pending"] is not None:
+                state["pending"].cancel()
+        await loop.run_in_executor(None, watcher.stop)
 
 
 if __name__ == "__main__":
@@ -108,4 +2072,3 @@ if __name__ == "__main__":
         on_created=on_file_created,
         on_modified=on_file_modified
     )
-
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared observer resources of Watcher.
+Run with: python -m pytest test_file_watcher.py
+"""
+
+import os
+import threading
+import time
+
+import pytest
+from watchdog.events import FileSystemEventHandler
+
+from file_watcher import ChangeBatcher, EventDispatcher, FileChangeHandler, InotifyObserver, PathFilter, Watcher, _PolledTree, inotify_init
+
+
+def open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+@pytest.mark.parametrize("polling", [False, True])
+def test_threads_and_fds_stay_constant_as_roots_are_added(tmp_path, polling):
+    if not polling and inotify_init is None:
+        pytest.skip("inotify not available")
+    
+    watcher = Watcher(polling=polling, poll_interval=0.05)
+    watcher.start()
+    try:
+        batches = []
+        watcher.add(str(tmp_path / "root-0"), on_batch=batches.append, debounce=0.05)
+        threads = threading.active_count()
+        fds = open_fds()
+        
+        for i in range(1, 50):
+            root = tmp_path / f"root-{i}"
+            (root / "sub").mkdir(parents=True)
+            watcher.add(str(root), on_batch=batches.append, debounce=0.05, exclude=["node_modules/"])
+        
+        assert threading.active_count() == threads
+        assert open_fds() == fds
+        
+        # Every root still gets its events (after the poller's baseline sweep)
+        time.sleep(0.5)
+        (tmp_path / "root-49" / "sub" / "file.txt").write_text("x")
+        assert wait_for(lambda: any(path.endswith("root-49/sub/file.txt") for batch in batches for _, path in batch))
+        
+        for i in range(50):
+            watcher.remove(str(tmp_path / f"root-{i}"))
+        assert threading.active_count() == threads
+        assert open_fds() == fds
+    finally:
+        watcher.stop()
+
+
+@pytest.mark.skipif(inotify_init is None, reason="inotify not available")
+def test_excluded_directories_are_not_watched(tmp_path):
+    (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "src").mkdir()
+    
+    watcher = Watcher()
+    assert isinstance(watcher.observer, InotifyObserver)
+    watcher.start()
+    try:
+        watcher.add(str(tmp_path), on_batch=lambda changes: None, exclude=["node_modules/"])
+        (tmp_path / "build" / "out").mkdir(parents=True)
+        (tmp_path / "node_modules" / "other").mkdir()
+        time.sleep(0.2)
+        
+        watched = set(watcher.observer._wds)
+        assert str(tmp_path / "src") in watched
+        assert str(tmp_path / "build" / "out") in watched
+        assert not any("node_modules" in path for path in watched)
+    finally:
+        watcher.stop()
+
+
+@pytest.mark.skipif(inotify_init is None, reason="inotify not available")
+def test_directory_renamed_before_its_create_is_handled_gets_watched(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub2").mkdir()
+    batches = []
+    
+    watcher = Watcher()
+    watcher.start()
+    try:
+        watcher.add(str(tmp_path), on_batch=batches.append, debounce=0.05)
+        # Keep the reader from handling IN_CREATE until after the rename
+        with watcher.observer._lock:
+            (tmp_path / "sub" / "x").mkdir()
+            os.rename(tmp_path / "sub" / "x", tmp_path / "sub2" / "late")
+            time.sleep(0.1)
+        
+        late = tmp_path / "sub2" / "late"
+        assert wait_for(lambda: str(late) in watcher.observer._wds)
+        (late / "file.txt").write_text("x")
+        assert wait_for(lambda: any(path == str(late / "file.txt") for batch in batches for _, path in batch))
+    finally:
+        watcher.stop()
+
+
+@pytest.mark.skipif(inotify_init is None, reason="inotify not available")
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_stopping_an_observer_that_never_started_closes_its_fds():
+    fds = open_fds()
+    observer = InotifyObserver()
+    assert open_fds() == fds + 3
+    observer.stop()
+    observer.join()
+    assert open_fds() == fds
+
+
+def test_on_batch_with_a_dispatcher_is_rejected(tmp_path):
+    dispatcher = EventDispatcher(workers=1)
+    batcher = ChangeBatcher(lambda changes: None)
+    watcher = Watcher(polling=True)
+    watcher.start()
+    try:
+        with pytest.raises(ValueError):
+            watcher.add(str(tmp_path), on_batch=lambda changes: None, dispatcher=dispatcher)
+        with pytest.raises(ValueError):
+            FileChangeHandler(batcher=batcher, dispatcher=dispatcher)
+        assert watcher.roots == []
+    finally:
+        batcher.stop()
+        watcher.stop()
+        dispatcher.stop()
+
+
+def test_polling_pass_stats_directories_and_scans_files_periodically(tmp_path):
+    for i in range(5):
+        (tmp_path / f"dir-{i}").mkdir()
+        for j in range(20):
+            (tmp_path / f"dir-{i}" / f"file-{j}.txt").write_text("x")
+    events = []
+    
+    class Recorder(FileSystemEventHandler):
+        def on_any_event(self, event):
+            events.append((event.event_type, event.src_path))
+    
+    tree = _PolledTree(Recorder(), str(tmp_path), True, None, file_scan_interval=0.2)
+    tree.initialize()
+    
+    # Six directories and none of the 100 files
+    cost, done = tree.sweep(10000, time.monotonic() + 5)
+    assert done and cost == 6 and not events
+    
+    # An in-place edit keeps the directory mtime and waits for the file scan
+    edited = tmp_path / "dir-3" / "file-7.txt"
+    mtime = os.stat(edited.parent).st_mtime_ns
+    edited.write_text("longer")
+    assert os.stat(edited.parent).st_mtime_ns == mtime
+    tree.sweep(10000, time.monotonic() + 5)
+    assert not events
+    
+    time.sleep(0.25)
+    cost, done = tree.sweep(10000, time.monotonic() + 5)
+    assert done and cost == 106
+    assert events == [("modified", str(edited))]
+
+
+@pytest.mark.parametrize("exclude, path, allowed", [
+    (["*.log", "!keep.log"], "keep.log", True),
+    (["*.log", "!keep.log", "keep.log"], "keep.log", False),
+    (["!keep.log", "*.log"], "keep.log", False),
+    (["*.log", "!keep.log"], "other.log", False),
+    (["logs/", "!logs/keep.log"], "logs/keep.log", True),
+])
+def test_last_matching_exclude_pattern_wins(tmp_path, exclude, path, allowed):
+    path_filter = PathFilter(str(tmp_path), exclude=exclude)
+    assert path_filter.allows(str(tmp_path / path)) is allowed
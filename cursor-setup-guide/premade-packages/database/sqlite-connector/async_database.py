@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Async SQLite Database Connector
+The User model and init_db flow from database.py on top of aiosqlite.
+"""
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from database import User, apply_pragmas, create_schema
+
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///app.db"
+
+
+def create_tuned_async_engine(url: str, echo: bool = False, **pragmas) -> AsyncEngine:
+    """
+    Create an aiosqlite engine with the same pragmas as create_tuned_engine().
+    
+    Args:
+        url (str): SQLAlchemy database URL, e.g. sqlite+aiosqlite:///app.db
+        echo (bool): Log SQL statements
+        **pragmas: Overrides for apply_pragmas(), e.g. synchronous="FULL"
+    
+    Returns:
+        AsyncEngine: Configured engine
+    """
+    engine = create_async_engine(url, echo=echo)
+    # Pragmas run on the underlying DBAPI connection, exposed by sync_engine
+    apply_pragmas(engine.sync_engine, **pragmas)
+    return engine
+
+
+# Database setup
+async_engine = create_tuned_async_engine(ASYNC_DATABASE_URL)
+# expire_on_commit=False: attributes stay loaded after commit, since lazy
+# loads can't be awaited implicitly
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+async def init_db():
+    """Initialize database and create tables."""
+    async with async_engine.begin() as connection:
+        await connection.run_sync(create_schema)
+    print("Database initialized")
+
+
+def get_session() -> AsyncSession:
+    """Get async database session. Use it with `async with`."""
+    return AsyncSessionLocal()
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """
+    Provide a transactional scope around a series of awaited operations.
+    
+    Commits on success, rolls back on error and always closes the session.
+    """
+    async with AsyncSessionLocal() as db_session:
+        try:
+            yield db_session
+            await db_session.commit()
+        except Exception:
+            await db_session.rollback()
+            raise
+
+
+async def dispose():
+    """Close pooled connections. Call before the event loop shuts down."""
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    import asyncio
+    from sqlalchemy import select
+    
+    async def main():
+        await init_db()
+        
+        # Create
+        async with session_scope() as db:
+            db.add(User(name="Async User", email="async@example.com"))
+        
+        # Read
+        async with get_session() as db:
+            users = (await db.scalars(select(User))).all()
+            print(f"Users: {users}")
+            
+            # Update
+            user = await db.scalar(select(User).where(User.email == "async@example.com"))
+            user.name = "Async User Updated"
+            await db.commit()
+            
+            # Delete
+            await db.delete(user)
+            await db.commit()
+        
+        await dispose()
+    
+    asyncio.run(main())
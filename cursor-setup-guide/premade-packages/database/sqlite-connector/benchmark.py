@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+SQLite Connector Benchmarks
+Compare insert strategies and measure CRUD throughput under concurrency.
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Any, Optional
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, User, bulk_insert, create_tuned_engine, keyset_page
+
+
+def _rows(count: int, start: int = 0) -> List[Dict[str, Any]]:
+    return [
+        {"name": f"User {i}", "email": f"user{i}@example.com"}
+        for i in range(start, start + count)
+    ]
+
+
+def _insert_per_row(engine, rows: List[Dict[str, Any]]):
+    """The documented pattern: session.add() and commit() for every row."""
+    session = sessionmaker(bind=engine)()
+    for row in rows:
+        session.add(User(**row))
+        session.commit()
+    session.close()
+
+
+def _insert_add_all(engine, rows: List[Dict[str, Any]]):
+    """ORM objects added in one go with a single commit."""
+    session = sessionmaker(bind=engine)()
+    session.add_all(User(**row) for row in rows)
+    session.commit()
+    session.close()
+
+
+def _insert_bulk(engine, rows: List[Dict[str, Any]]):
+    bulk_insert(rows, batch_size=5000, bind=engine)
+
+
+def _upsert_bulk(engine, rows: List[Dict[str, Any]]):
+    # Half of the rows already exist, so half of the batch updates
+    bulk_insert(rows[: len(rows) // 2], batch_size=5000, bind=engine)
+    bulk_insert(rows, batch_size=5000, upsert=True, bind=engine)
+
+
+def bench_inserts(rows: int = 100_000, per_row_rows: int = 2_000):
+    """
+    Measure rows/sec for each insert strategy on a fresh database file.
+    
+    Args:
+        rows (int): Rows for the batched strategies
+        per_row_rows (int): Rows for commit-per-row, which is far slower
+    """
+    strategies: List[tuple] = [
+        ("add + commit per row", _insert_per_row, per_row_rows),
+        ("add_all + one commit", _insert_add_all, rows),
+        ("bulk_insert", _insert_bulk, rows),
+        ("bulk_insert upsert", _upsert_bulk, rows),
+    ]
+    
+    print(f"{'strategy':<22} {'rows':>9} {'seconds':>9} {'rows/sec':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, run, count in strategies:
+            path = os.path.join(directory, f"{run.__name__}.db")
+            engine = create_engine(f"sqlite:///{path}")
+            Base.metadata.create_all(engine)
+            
+            start = time.perf_counter()
+            run(engine, _rows(count))
+            elapsed = time.perf_counter() - start
+            engine.dispose()
+            
+            print(f"{name:<22} {count:>9,} {elapsed:>9.3f} {count / elapsed:>12,.0f}")
+
+
+# Engine factories compared by the CRUD benchmark
+PROFILES: Dict[str, Callable[[str], Any]] = {
+    "default": lambda url: create_engine(url),
+    "tuned": lambda url: create_tuned_engine(url),
+}
+
+
+def _op_insert_single(db, worker: int, i: int, context: Dict[str, Any]):
+    db.add(User(name=f"Single {worker}-{i}", email=f"single{worker}-{i}@example.com"))
+    db.commit()
+
+
+def _op_insert_bulk(db, worker: int, i: int, context: Dict[str, Any]):
+    batch = context["bulk_batch"]
+    rows = [
+        {"name": f"Bulk {worker}-{i}-{n}", "email": f"bulk{worker}-{i}-{n}@example.com"}
+        for n in range(batch)
+    ]
+    bulk_insert(rows, batch_size=batch, bind=db.get_bind())
+
+
+def _op_lookup(db, worker: int, i: int, context: Dict[str, Any]):
+    db.get(User, context["random"].randint(1, context["size"]))
+    # Drop the identity map so every lookup goes to the database
+    db.expunge_all()
+    db.rollback()
+
+
+def _op_scan(db, worker: int, i: int, context: Dict[str, Any]):
+    start = context["random"].randint(0, max(context["size"] - context["scan_rows"], 0))
+    keyset_page(db, after=start, limit=context["scan_rows"])
+    db.expunge_all()
+    db.rollback()
+
+
+def _op_update(db, worker: int, i: int, context: Dict[str, Any]):
+    user = db.get(User, context["random"].randint(1, context["size"]))
+    user.name = f"Updated {worker}-{i}"
+    db.commit()
+
+
+def _op_delete(db, worker: int, i: int, context: Dict[str, Any]):
+    ids = context["delete_ids"][worker]
+    if i < len(ids):
+        db.execute(delete(User).where(User.id == ids[i]))
+        db.commit()
+
+
+# Run in this order: deletes come last so earlier operations see every row
+OPERATIONS: Dict[str, Callable] = {
+    "insert_single": _op_insert_single,
+    "insert_bulk": _op_insert_bulk,
+    "lookup": _op_lookup,
+    "scan": _op_scan,
+    "update": _op_update,
+    "delete": _op_delete,
+}
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def _run_threads(
+    engine,
+    operation: Callable,
+    threads: int,
+    ops_per_thread: int,
+    context: Dict[str, Any],
+    profilers: Optional[List[cProfile.Profile]] = None
+) -> Dict[str, Any]:
+    """
+    Run an operation on several threads at once, one session per thread.
+    
+    cProfile only sees the thread that enabled it, so when profilers is a list
+    each worker profiles itself and appends its profiler to it.
+    """
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+    barrier = threading.Barrier(threads + 1)
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    
+    def worker(index: int):
+        local_context = dict(context, random=random.Random(index))
+        local_latencies = []
+        local_errors = 0
+        db = Session()
+        profiler = cProfile.Profile() if profilers is not None else None
+        barrier.wait()
+        if profiler:
+            profiler.enable()
+        for i in range(ops_per_thread):
+            start = time.perf_counter()
+            try:
+                operation(db, index, i, local_context)
+            except Exception:
+                db.rollback()
+                local_errors += 1
+            local_latencies.append(time.perf_counter() - start)
+        if profiler:
+            profiler.disable()
+        db.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+            if profiler:
+                profilers.append(profiler)
+    
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    ops = threads * ops_per_thread
+    return {
+        "ops": ops,
+        "errors": errors[0],
+        "seconds": round(elapsed, 4),
+        "ops_per_second": round(ops / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def bench_crud(
+    sizes: List[int] = None,
+    thread_counts: List[int] = None,
+    profiles: List[str] = None,
+    operations: List[str] = None,
+    ops_per_thread: int = 100,
+    bulk_batch: int = 100,
+    scan_rows: int = 1000,
+    as_json: bool = False,
+    profile_path: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Measure CRUD throughput and latency for each engine profile, table size
+    and thread count. Every combination gets a freshly seeded database.
+    
+    Args:
+        sizes (list, optional): Rows to seed before measuring
+        thread_counts (list, optional): Concurrent threads, each with its own session
+        profiles (list, optional): Subset of PROFILES to compare
+        operations (list, optional): Subset of OPERATIONS to run
+        ops_per_thread (int): Operations each thread performs
+        bulk_batch (int): Rows per insert_bulk operation
+        scan_rows (int): Rows read per scan operation
+        as_json (bool): Print JSON instead of a table
+        profile_path (str, optional): Profile the worker threads and write
+            the merged cProfile stats to this file
+    
+    Returns:
+        list: One result dict per profile, size, thread count and operation
+    """
+    sizes = sizes or [1_000, 100_000]
+    thread_counts = thread_counts or [1, 4, 16]
+    results = []
+    profilers: Optional[List[cProfile.Profile]] = [] if profile_path else None
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in profiles or list(PROFILES):
+            for size in sizes:
+                for threads in thread_counts:
+                    path = os.path.join(directory, f"{profile}-{size}-{threads}.db")
+                    engine = PROFILES[profile](f"sqlite:///{path}")
+                    Base.metadata.create_all(engine)
+                    bulk_insert(_rows(size), batch_size=5000, bind=engine)
+                    
+                    # Each thread deletes its own distinct seeded rows
+                    doomed = random.Random(size).sample(range(1, size + 1), min(size, threads * ops_per_thread))
+                    context = {
+                        "size": size,
+                        "bulk_batch": bulk_batch,
+                        "scan_rows": scan_rows,
+                        "delete_ids": [doomed[index::threads] for index in range(threads)],
+                    }
+                    
+                    for name in operations or list(OPERATIONS):
+                        result = _run_threads(engine, OPERATIONS[name], threads, ops_per_thread, context, profilers)
+                        results.append({
+                            "profile": profile,
+                            "rows": size,
+                            "threads": threads,
+                            "operation": name,
+                            **result
+                        })
+                    engine.dispose()
+    
+    if as_json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(
+            f"{'profile':<8} {'rows':>8} {'threads':>7} {'operation':<14} "
+            f"{'ops/sec':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}"
+        )
+        for result in results:
+            print(
+                f"{result['profile']:<8} {result['rows']:>8,} {result['threads']:>7} "
+                f"{result['operation']:<14} {result['ops_per_second']:>10,.1f} "
+                f"{result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} {result['errors']:>6}"
+            )
+    
+    if profilers:
+        stats = pstats.Stats(*profilers, stream=sys.stderr)
+        stats.dump_stats(profile_path)
+        # stderr keeps stdout clean for --json
+        stats.sort_stats("cumulative").print_stats(20)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite connector")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    
+    inserts_parser = subparsers.add_parser("inserts", help="Compare insert strategies")
+    inserts_parser.add_argument("--rows", type=int, default=100_000, help="Rows for batched strategies")
+    inserts_parser.add_argument("--per-row-rows", type=int, default=2_000, help="Rows for commit-per-row")
+    
+    crud_parser = subparsers.add_parser("crud", help="CRUD throughput by profile, size and threads")
+    crud_parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000], help="Seeded rows")
+    crud_parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16], help="Thread counts")
+    crud_parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), help="Engine profiles")
+    crud_parser.add_argument("--operations", nargs="+", choices=list(OPERATIONS), help="Operations to run")
+    crud_parser.add_argument("--ops", type=int, default=100, help="Operations per thread")
+    crud_parser.add_argument("--bulk-batch", type=int, default=100, help="Rows per bulk insert")
+    crud_parser.add_argument("--scan-rows", type=int, default=1000, help="Rows per scan")
+    crud_parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    crud_parser.add_argument("--cprofile", metavar="FILE", help="Profile worker threads, write stats to FILE")
+    
+    args = parser.parse_args()
+    
+    if args.benchmark == "inserts":
+        bench_inserts(args.rows, args.per_row_rows)
+    else:
+        bench_crud(
+            sizes=args.sizes,
+            thread_counts=args.threads,
+            profiles=args.profiles,
+            operations=args.operations,
+            ops_per_thread=args.ops,
+            bulk_batch=args.bulk_batch,
+            scan_rows=args.scan_rows,
+            as_json=args.json,
+            profile_path=args.cprofile
+        )
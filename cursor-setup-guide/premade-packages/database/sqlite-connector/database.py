@@ -4,10 +4,15 @@ SQLite Database Connector
 Simple database setup with SQLAlchemy.
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+from contextlib import contextmanager
+from itertools import islice
+from sqlalchemy import create_engine, event, select, tuple_, Column, Integer, String, DateTime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session, Session
 from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 Base = declarative_base()
 
@@ -19,21 +24,94 @@ class User(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
     email = Column(String(100), unique=True, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Indexed for keyset pagination. SQLite appends the rowid (id) to every
+    # index entry, so this also serves ORDER BY created_at, id
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f"<User(id={self.id}, name='{self.name}', email='{self.email}')>"
 
 
+def apply_pragmas(
+    engine: Engine,
+    journal_mode: str = "WAL",
+    synchronous: str = "NORMAL",
+    cache_size: int = -64000,
+    mmap_size: int = 256 * 1024 * 1024,
+    busy_timeout: int = 5000
+):
+    """
+    Run performance pragmas on every new connection the engine opens.
+    
+    Args:
+        engine (Engine): Engine to configure
+        journal_mode (str): WAL lets readers run while a write is in progress
+        synchronous (str): NORMAL is safe with WAL and avoids an fsync per commit
+        cache_size (int): Page cache size; negative values are in KiB
+        mmap_size (int): Bytes of the database file to memory-map
+        busy_timeout (int): Milliseconds to wait for a lock before failing
+    """
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA cache_size={int(cache_size)}")
+        cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+        cursor.close()
+
+
+def create_tuned_engine(url: str, echo: bool = False, **pragmas) -> Engine:
+    """
+    Create a SQLite engine that applies performance pragmas on every connection.
+    
+    Args:
+        url (str): SQLAlchemy database URL
+        echo (bool): Log SQL statements
+        **pragmas: Overrides for apply_pragmas(), e.g. synchronous="FULL"
+    
+    Returns:
+        Engine: Configured engine
+    """
+    engine = create_engine(
+        url,
+        echo=echo,
+        # Connections are handed between threads by the pool, never shared
+        connect_args={"check_same_thread": False}
+    )
+    apply_pragmas(engine, **pragmas)
+    return engine
+
+
 # Database setup
 DATABASE_URL = "sqlite:///app.db"
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_tuned_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Thread-local sessions: each thread gets its own session from the registry
+ScopedSession = scoped_session(SessionLocal)
+
+
+def create_schema(bind):
+    """
+    Create missing tables and indexes.
+    
+    create_all() only creates indexes together with new tables, so indexes
+    added to an existing model are created here as well.
+    
+    Args:
+        bind: Engine or connection to create the schema on
+    """
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
 
 def init_db():
     """Initialize database and create tables."""
-    Base.metadata.create_all(bind=engine)
+    create_schema(engine)
     print("Database initialized")
 
 
@@ -42,8 +120,172 @@ def get_session():
     return SessionLocal()
 
 
-# Global session (use get_session() for better practice)
-session = SessionLocal()
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Provide a transactional scope around a series of operations.
+    
+    Commits on success, rolls back on error and always closes the session.
+    """
+    db_session = SessionLocal()
+    try:
+        yield db_session
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        raise
+    finally:
+        db_session.close()
+
+
+def bulk_insert(
+    rows: Iterable[Dict[str, Any]],
+    model=User,
+    batch_size: int = 1000,
+    upsert: bool = False,
+    conflict_column: str = "email",
+    bind: Optional[Engine] = None
+) -> int:
+    """
+    Insert many rows with one transaction and one executemany per batch.
+    
+    Args:
+        rows (iterable): Dicts of column values. Rows in a batch should
+            have the same keys
+        model: Mapped class to insert into
+        batch_size (int): Rows per transaction
+        upsert (bool): Update existing rows on a conflict instead of failing
+        conflict_column (str): Unique column that identifies existing rows
+        bind (Engine, optional): Engine to use. Defaults to the module engine
+    
+    Returns:
+        int: Number of rows written
+    """
+    bind = bind or engine
+    rows = iter(rows)
+    total = 0
+    
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        
+        statement = sqlite_insert(model)
+        if upsert:
+            # Update every supplied column except the key and the conflict column
+            primary_keys = {column.name for column in model.__table__.primary_key}
+            statement = statement.on_conflict_do_update(
+                index_elements=[conflict_column],
+                set_={
+                    key: statement.excluded[key]
+                    for key in batch[0]
+                    if key != conflict_column and key not in primary_keys
+                }
+            )
+        
+        with bind.begin() as connection:
+            connection.execute(statement, batch)
+        total += len(batch)
+    
+    return total
+
+
+def keyset_page(
+    db_session: Session,
+    model=User,
+    order_by: str = "id",
+    after: Optional[Any] = None,
+    limit: int = 100,
+    descending: bool = False
+) -> Tuple[List, Optional[Any]]:
+    """
+    Fetch one page by seeking past the last row of the previous page.
+    
+    Unlike OFFSET, the database jumps straight to the cursor position
+    through the index, so page N costs the same as page 1.
+    
+    Args:
+        db_session (Session): Session to query with
+        model: Mapped class with id and created_at columns
+        order_by (str): "id" or "created_at" (ties broken by id)
+        after: Cursor returned with the previous page. None for the first page
+        limit (int): Rows per page
+        descending (bool): Newest first
+    
+    Returns:
+        tuple: (rows, cursor for the next page, or None after the last page)
+    """
+    if order_by == "id":
+        key = model.id
+    elif order_by == "created_at":
+        key = tuple_(model.created_at, model.id)
+    else:
+        raise ValueError(f"Cannot paginate on {order_by!r}; use 'id' or 'created_at'")
+    
+    statement = select(model)
+    if after is not None:
+        statement = statement.where(key < after if descending else key > after)
+    if order_by == "id":
+        ordering = [model.id.desc() if descending else model.id]
+    else:
+        ordering = [
+            model.created_at.desc() if descending else model.created_at,
+            model.id.desc() if descending else model.id
+        ]
+    rows = list(db_session.scalars(statement.order_by(*ordering).limit(limit)))
+    
+    if len(rows) < limit:
+        return rows, None
+    last = rows[-1]
+    cursor = last.id if order_by == "id" else (last.created_at, last.id)
+    return rows, cursor
+
+
+def iter_chunks(
+    model=User,
+    chunk_size: int = 1000,
+    order_by: str = "id",
+    db_session: Optional[Session] = None
+) -> Iterator[List]:
+    """
+    Yield every row of a table in fixed-size chunks.
+    
+    Each chunk is a separate keyset query, so only one chunk of ORM objects
+    is alive at a time and no read transaction stays open between chunks.
+    
+    Args:
+        model: Mapped class with id and created_at columns
+        chunk_size (int): Rows per chunk
+        order_by (str): "id" or "created_at"
+        db_session (Session, optional): Session to use. Defaults to a new
+            session that is closed when iteration ends
+    
+    Yields:
+        list: Up to chunk_size model instances
+    """
+    owns_session = db_session is None
+    db_session = db_session or SessionLocal()
+    cursor = None
+    try:
+        while True:
+            rows, cursor = keyset_page(db_session, model, order_by, cursor, chunk_size)
+            if rows:
+                yield rows
+            if cursor is None:
+                break
+            if owns_session:
+                # Detach the chunk (it stays readable) and end the read
+                # transaction so the WAL can checkpoint
+                db_session.expunge_all()
+                db_session.commit()
+    finally:
+        if owns_session:
+            db_session.close()
+
+
+# Global session (use session_scope() for better practice). This is the
+# thread-local registry, so each thread that uses it gets its own session
+session = ScopedSession
 
 
 if __name__ == "__main__":
@@ -60,6 +302,10 @@ if __name__ == "__main__":
     users = session.query(User).all()
     print(f"All users: {users}")
     
+    # Stream large tables in chunks instead of loading them at once
+    for chunk in iter_chunks(User, chunk_size=500):
+        print(f"Chunk of {len(chunk)} users")
+    
     # Update
     user.name = "Jane Doe"
     session.commit()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Query Cache
+Read-through LRU/TTL cache for primary-key and unique-key lookups.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from database import SessionLocal
+
+
+class QueryCache:
+    """
+    Cache row values for hot lookups and drop them when the ORM writes the row.
+    
+    Usage:
+        cache = QueryCache(max_size=10_000, ttl=300)
+        with session_scope() as db:
+            user = cache.get(db, User, 42)
+            user = cache.get_by(db, User, "email", "john@example.com")
+        print(cache.stats())
+    
+    Only rows written through an ORM session flush are invalidated. Core
+    statements such as bulk_insert() bypass the session, so call clear()
+    after them.
+    """
+    
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0, session_factory=SessionLocal):
+        """
+        Args:
+            max_size (int): Cached rows before the least recently used is evicted
+            ttl (float): Seconds a cached row stays valid
+            session_factory: sessionmaker (or Session class) whose flushes
+                invalidate the cache. Defaults to the module SessionLocal
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._session_factory = session_factory
+        # cache key -> (expires at, column values, (model, primary key))
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any], Tuple]]" = OrderedDict()
+        # (model, primary key) -> cache keys holding that row
+        self._keys_by_row: Dict[Tuple, Set[Tuple]] = {}
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        
+        event.listen(session_factory, "after_flush", self._after_flush)
+        event.listen(session_factory, "after_commit", self._after_commit)
+        event.listen(session_factory, "after_rollback", self._after_rollback)
+    
+    def get(self, db_session: Session, model, ident: Any):
+        """
+        Look up a row by primary key.
+        
+        Args:
+            db_session (Session): Session the returned instance belongs to
+            model: Mapped class
+            ident: Primary key value
+        
+        Returns:
+            Instance of model, or None if the row does not exist
+        """
+        key = (model, None, ident)
+        values = self._lookup(key)
+        if values is not None:
+            return self._attach(db_session, model, values)
+        
+        instance = db_session.get(model, ident)
+        if instance is not None:
+            self._store(db_session, key, model, instance)
+        return instance
+    
+    def get_by(self, db_session: Session, model, column: str, value: Any):
+        """
+        Look up a row by a unique column, e.g. get_by(db, User, "email", address).
+        
+        Args:
+            db_session (Session): Session the returned instance belongs to
+            model: Mapped class
+            column (str): Name of a unique or primary key column
+            value: Value to match
+        
+        Returns:
+            Instance of model, or None if no row matches
+        """
+        mapped_column = inspect(model).columns[column]
+        if not (mapped_column.unique or mapped_column.primary_key):
+            raise ValueError(f"{model.__name__}.{column} is not unique and cannot be cached")
+        
+        key = (model, column, value)
+        values = self._lookup(key)
+        if values is not None:
+            return self._attach(db_session, model, values)
+        
+        instance = db_session.scalar(select(model).where(mapped_column == value))
+        if instance is not None:
+            self._store(db_session, key, model, instance)
+        return instance
+    
+    def invalidate(self, model, ident: Any):
+        """Drop every cached entry for one row."""
+        with self._lock:
+            self._drop_row((model, ident))
+    
+    def clear(self):
+        """Drop all cached rows."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_row.clear()
+    
+    def stats(self) -> dict:
+        """Return hit/miss counters, the hit rate and the current size."""
+        with self._lock:
+            stats = dict(self._counts)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+    
+    def close(self):
+        """Stop listening to session events."""
+        event.remove(self._session_factory, "after_flush", self._after_flush)
+        event.remove(self._session_factory, "after_commit", self._after_commit)
+        event.remove(self._session_factory, "after_rollback", self._after_rollback)
+    
+    def _lookup(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop_key(key)
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts["hits"] += 1
+            return entry[1]
+    
+    def _store(self, db_session: Session, key: Tuple, model, instance):
+        if not self._committed(db_session, instance):
+            return
+        mapper = inspect(model)
+        # Plain column values, so cached rows are never shared between sessions
+        values = {attr.key: getattr(instance, attr.key) for attr in mapper.column_attrs}
+        row = (model, mapper.primary_key_from_instance(instance)[0])
+        
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, values, row)
+            self._entries.move_to_end(key)
+            self._keys_by_row.setdefault(row, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._drop_key(oldest)
+                self._counts["evictions"] += 1
+    
+    @staticmethod
+    def _committed(db_session: Session, instance) -> bool:
+        """
+        Check that an instance holds what other sessions would read. With
+        autoflush off, a session can hold unflushed edits; after a flush it
+        can hold writes that may still be rolled back.
+        """
+        if db_session.info.get("query_cache_rows") is not None:
+            # Flushed but not yet committed
+            return False
+        if instance in db_session.new or instance in db_session.dirty or instance in db_session.deleted:
+            return False
+        return not db_session.is_modified(instance)
+    
+    def _attach(self, db_session: Session, model, values: Dict[str, Any]):
+        instance = model(**values)
+        make_transient_to_detached(instance)
+        # load=False trusts the cached values instead of selecting the row;
+        # if the row is already in the session, that instance is returned
+        return db_session.merge(instance, load=False)
+    
+    def _drop_key(self, key: Tuple):
+        _, _, row = self._entries.pop(key)
+        keys = self._keys_by_row.get(row)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_row[row]
+    
+    def _drop_row(self, row: Tuple):
+        keys = self._keys_by_row.pop(row, ())
+        for key in keys:
+            self._entries.pop(key, None)
+        if keys:
+            self._counts["invalidations"] += 1
+    
+    def _after_flush(self, db_session: Session, flush_context):
+        rows = set(db_session.info.get("query_cache_rows", ()))
+        for instance in list(db_session.dirty) + list(db_session.deleted):
+            identity = inspect(instance).identity
+            if identity is not None:
+                rows.add((type(instance), identity[0]))
+        db_session.info["query_cache_rows"] = rows
+        # Drop now so this session's own reads see its changes
+        with self._lock:
+            for row in rows:
+                self._drop_row(row)
+    
+    def _after_commit(self, db_session: Session):
+        # Drop again: another session may have cached the old committed
+        # values between this session's flush and its commit
+        rows = db_session.info.pop("query_cache_rows", ())
+        with self._lock:
+            for row in rows:
+                self._drop_row(row)
+    
+    def _after_rollback(self, db_session: Session):
+        # Rows cached from this session's flushed writes never existed for
+        # anyone else; drop them before forgetting which they were
+        rows = db_session.info.pop("query_cache_rows", ())
+        with self._lock:
+            for row in rows:
+                self._drop_row(row)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for QueryCache consistency with uncommitted session state.
+Run with: python -m pytest test_query_cache.py
+"""
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from database import User, create_schema, create_tuned_engine
+from query_cache import QueryCache
+
+
+@pytest.fixture
+def factory(tmp_path):
+    engine = create_tuned_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    create_schema(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with session_factory() as db:
+        db.add(User(id=1, name="Original", email="user@example.com"))
+        db.commit()
+    yield session_factory
+    engine.dispose()
+
+
+@pytest.fixture
+def cache(factory):
+    cache = QueryCache(session_factory=factory)
+    yield cache
+    cache.close()
+
+
+def test_dirty_unflushed_instance_is_not_cached(factory, cache):
+    with factory() as writer:
+        user = writer.get(User, 1)
+        user.name = "Unwritten"
+        assert cache.get(writer, User, 1).name == "Unwritten"
+        
+        with factory() as reader:
+            assert cache.get(reader, User, 1).name == "Original"
+            assert cache.get_by(reader, User, "email", "user@example.com").name == "Original"
+        writer.rollback()
+
+
+def test_flushed_then_rolled_back_value_is_not_served(factory, cache):
+    with factory() as writer:
+        user = writer.get(User, 1)
+        user.name = "Rolled back"
+        writer.flush()
+        assert cache.get(writer, User, 1).name == "Rolled back"
+        writer.rollback()
+    
+    with factory() as reader:
+        assert cache.get(reader, User, 1).name == "Original"
+
+
+def test_rollback_evicts_rows_flushed_by_the_session(factory, cache):
+    with factory() as reader:
+        assert cache.get(reader, User, 1).name == "Original"
+    
+    with factory() as writer:
+        writer.get(User, 1).name = "Rolled back"
+        writer.flush()
+        # Cached again by another session while the write is uncommitted
+        with factory() as reader:
+            cache.get(reader, User, 1)
+        writer.rollback()
+    
+    assert cache.stats()["size"] == 0
+    with factory() as reader:
+        assert cache.get(reader, User, 1).name == "Original"
+
+
+def test_committed_change_is_visible(factory, cache):
+    with factory() as reader:
+        assert cache.get(reader, User, 1).name == "Original"
+    with factory() as writer:
+        writer.get(User, 1).name = "Committed"
+        writer.commit()
+    with factory() as reader:
+        assert cache.get(reader, User, 1).name == "Committed"
@@ -7,8 +7,13 @@ A basic Discord bot using discord.py
 import discord
 from discord.ext import commands
 import os
+import time
 from dotenv import load_dotenv
 
+from cache_config import CacheConfig
+from command_tools import cached_response, cooldown
+from metrics import BotMetrics, QueueLogging
+
 # Load environment variables
 load_dotenv()
 
@@ -20,19 +25,41 @@ if not DISCORD_BOT_TOKEN:
     print("Create a .env file with: DISCORD_BOT_TOKEN=your_bot_token_here")
     exit(1)
 
+# Message and event logging goes through a queue; a background thread writes it
+log = QueueLogging("bot")
+logger = log.logger
+
+# Loop lag and command timings. Set METRICS_FILE to dump them periodically
+metrics = BotMetrics(log=log)
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "60"))
+
+# Only the intents the bot uses and bounded caches; see cache_config.py
+try:
+    cache_config = CacheConfig.from_env()
+    bot_options = cache_config.bot_options()
+except ValueError as e:
+    print(f"Error: invalid cache configuration: {e}")
+    exit(1)
+
 # Set up bot with command prefix
-intents = discord.Intents.default()
-intents.message_content = True  # Required for reading message content
-bot = commands.Bot(command_prefix='!', intents=intents)
+bot = commands.Bot(command_prefix='!', **bot_options)
+
+
+@bot.event
+async def setup_hook():
+    """Called once before connecting; starts background monitoring."""
+    metrics.start(dump_path=METRICS_FILE, dump_interval=METRICS_INTERVAL)
 
 
 @bot.event
 async def on_ready():
     """Called when bot is ready and connected to Discord."""
-    print(f'{bot.user} has connected to Discord!')
-    print(f'Bot is in {len(bot.guilds)} server(s)')
+    logger.info('%s has connected to Discord!', bot.user)
+    logger.info('Bot is in %d server(s)', len(bot.guilds))
+    logger.info('Cache: %s', cache_config.describe())
     for guild in bot.guilds:
-        print(f'  - {guild.name} (id: {guild.id})')
+        logger.info('  - %s (id: %s)', guild.name, guild.id)
 
 
 @bot.event
@@ -42,20 +69,36 @@ async def on_message(message):
     if message.author == bot.user:
         return
     
-    # Log message
-    print(f'Message from {message.author}: {message.content}')
+    # Log message (queued, so a slow stdout can't block the event loop)
+    metrics.messages += 1
+    logger.info('Message from %s: %s', message.author, message.content)
     
     # Process commands
     await bot.process_commands(message)
 
 
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.command_started = time.perf_counter()
+
+
+@bot.after_invoke
+async def stop_command_timer(ctx):
+    # Runs even when the command raised
+    started = getattr(ctx, 'command_started', None)
+    if started is not None:
+        metrics.record_command(ctx.command.qualified_name, time.perf_counter() - started, ctx.command_failed)
+
+
 @bot.command(name='hello')
+@cooldown(3, 10, "user")
 async def hello(ctx):
     """Respond to !hello command."""
     await ctx.send(f'Hello, {ctx.author.mention}!')
 
 
 @bot.command(name='ping')
+@cooldown(3, 10, "user")
 async def ping(ctx):
     """Respond to !ping command with latency."""
     latency = round(bot.latency * 1000)
@@ -63,8 +106,11 @@ async def ping(ctx):
 
 
 @bot.command(name='info')
+@cooldown(3, 10, "user")
+@cooldown(10, 10, "guild")
+@cached_response(ttl=30, per="guild")
 async def info(ctx):
-    """Display bot information."""
+    """Display bot information (cached per server for 30 seconds)."""
     embed = discord.Embed(
         title="Bot Information",
         description="A simple Discord bot example",
@@ -72,6 +118,34 @@ async def info(ctx):
     )
     embed.add_field(name="Server", value=ctx.guild.name, inline=True)
     embed.add_field(name="Latency", value=f"{round(bot.latency * 1000)}ms", inline=True)
+    return embed
+
+
+@bot.command(name='stats')
+@cooldown(2, 30, "guild")
+async def stats(ctx):
+    """Display event-loop lag and command timings."""
+    snapshot = metrics.snapshot()
+    lag = snapshot['loop_lag']
+    embed = discord.Embed(
+        title="Bot Stats",
+        description=f"Up {snapshot['uptime_seconds']:.0f}s, {snapshot['messages_seen']} messages seen",
+        color=discord.Color.blue()
+    )
+    embed.add_field(
+        name="Event loop lag",
+        value=f"last {lag['last_ms']:.1f}ms, avg {lag['avg_ms']:.1f}ms, "
+              f"p95 {lag['p95_ms']:.1f}ms, max {lag['max_ms']:.1f}ms",
+        inline=False
+    )
+    for name, command in snapshot['commands'].items():
+        embed.add_field(
+            name=f"!{name}",
+            value=f"{command['calls']} calls, {command['errors']} errors\n"
+                  f"avg {command['avg_ms']:.1f}ms, p95 {command['p95_ms']:.1f}ms",
+            inline=True
+        )
+    embed.set_footer(text=f"Log queue: {log.pending} pending, {log.dropped} dropped")
     await ctx.send(embed=embed)
 
 
@@ -80,8 +154,13 @@ async def on_command_error(ctx, error):
     """Handle command errors."""
     if isinstance(error, commands.CommandNotFound):
         await ctx.send("Command not found. Use !help to see available commands.")
+    elif isinstance(error, commands.CommandOnCooldown):
+        # Reply once per burst; further attempts are dropped without an API call
+        if getattr(error.cooldown, 'notify', True):
+            await ctx.send(f"Slow down, {ctx.author.mention}! Try again in {error.retry_after:.0f}s.",
+                           delete_after=error.retry_after)
     else:
-        print(f"Error: {error}")
+        logger.error("Error: %s", error)
         await ctx.send(f"An error occurred: {error}")
 
 
@@ -92,4 +171,8 @@ if __name__ == "__main__":
         print("Error: Invalid bot token. Please check your .env file.")
     except Exception as e:
         print(f"Error starting bot: {e}")
+    finally:
+        if METRICS_FILE:
+            metrics.dump(METRICS_FILE)
+        log.stop()
 
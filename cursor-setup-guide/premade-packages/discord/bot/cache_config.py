@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Bot Cache Configuration
+Intents and cache limits that keep the bot's memory use bounded.
+"""
+
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import discord
+
+# Intents the bot's own handlers need: guild data for ctx.guild, message
+# events in servers and DMs, and message content for prefix commands.
+# Everything else (typing, reactions, voice, presences, ...) only adds
+# gateway traffic and cached state the bot never reads.
+MINIMAL_INTENTS = ("guilds", "guild_messages", "dm_messages", "message_content")
+
+MEMBER_CACHE_OPTIONS = ("none", "voice", "joined", "all")
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def build_intents(extra: Iterable[str] = ()) -> discord.Intents:
+    """
+    Build the minimal intents plus any extra ones.
+    
+    Args:
+        extra (iterable): Additional intent names, e.g. ["members", "voice_states"]
+    
+    Returns:
+        discord.Intents: Intents with only the named flags enabled
+    """
+    intents = discord.Intents.none()
+    for name in (*MINIMAL_INTENTS, *extra):
+        if name not in discord.Intents.VALID_FLAGS:
+            raise ValueError(f"Unknown intent: {name}")
+        setattr(intents, name, True)
+    return intents
+
+
+def parse_member_cache(value: str) -> discord.MemberCacheFlags:
+    """
+    Parse a member cache setting: none, voice, joined, all, or "voice,joined".
+    
+    Returns:
+        discord.MemberCacheFlags: Flags for the member_cache_flags option
+    """
+    names = [name.strip().lower() for name in value.split(",") if name.strip()]
+    if "all" in names:
+        return discord.MemberCacheFlags.all()
+    
+    flags = discord.MemberCacheFlags.none()
+    for name in names:
+        if name == "none":
+            continue
+        if name not in ("voice", "joined"):
+            raise ValueError(f"Unknown member cache setting: {name} (expected one of {', '.join(MEMBER_CACHE_OPTIONS)})")
+        setattr(flags, name, True)
+    return flags
+
+
+class CacheConfig:
+    """
+    Cache sizes and intents for the bot, readable from the environment.
+    
+    The defaults keep per-guild memory small: only the intents the bot uses,
+    no cached members other than the bot itself, no guild chunking, and a
+    100-message cache (only needed for edit/delete/reaction events on
+    recent messages).
+    
+    Usage:
+        config = CacheConfig.from_env()
+        bot = commands.Bot(command_prefix='!', **config.bot_options())
+    """
+    
+    def __init__(
+        self,
+        max_messages: Optional[int] = 100,
+        member_cache: str = "none",
+        chunk_guilds: bool = False,
+        extra_intents: Iterable[str] = ()
+    ):
+        """
+        Args:
+            max_messages (int, optional): Messages kept in the message cache.
+                None or 0 disables it
+            member_cache (str): Members to cache: none, voice, joined, all, or
+                a comma-separated combination such as "voice,joined"
+            chunk_guilds (bool): Download every guild's member list at startup
+            extra_intents (iterable): Intent names to enable on top of
+                MINIMAL_INTENTS
+        """
+        # discord.py treats max_messages <= 0 as "use the default of 1000"
+        self.max_messages = max_messages or None
+        self.member_cache = member_cache
+        self.chunk_guilds = chunk_guilds
+        self.extra_intents: Tuple[str, ...] = tuple(extra_intents)
+    
+    @classmethod
+    def from_env(cls) -> "CacheConfig":
+        """
+        Read BOT_MAX_MESSAGES, BOT_MEMBER_CACHE, BOT_CHUNK_GUILDS and
+        BOT_EXTRA_INTENTS (comma-separated). Unset variables keep the defaults.
+        """
+        defaults = cls()
+        max_messages = os.getenv("BOT_MAX_MESSAGES")
+        chunk_guilds = os.getenv("BOT_CHUNK_GUILDS")
+        extra_intents = os.getenv("BOT_EXTRA_INTENTS", "")
+        return cls(
+            max_messages=int(max_messages) if max_messages else defaults.max_messages,
+            member_cache=os.getenv("BOT_MEMBER_CACHE") or defaults.member_cache,
+            chunk_guilds=chunk_guilds.strip().lower() in TRUE_VALUES if chunk_guilds else defaults.chunk_guilds,
+            extra_intents=[name.strip() for name in extra_intents.split(",") if name.strip()]
+        )
+    
+    def member_cache_flags(self) -> discord.MemberCacheFlags:
+        return parse_member_cache(self.member_cache)
+    
+    def intents(self) -> discord.Intents:
+        """
+        Minimal intents, the extra ones, and those the member cache and
+        chunking settings require (voice_states for voice, members for
+        joined and chunking).
+        """
+        extra = list(self.extra_intents)
+        flags = self.member_cache_flags()
+        if flags.voice:
+            extra.append("voice_states")
+        if flags.joined or self.chunk_guilds:
+            extra.append("members")
+        return build_intents(extra)
+    
+    def bot_options(self) -> Dict[str, Any]:
+        """
+        Keyword arguments for discord.Client / commands.Bot.
+        
+        Raises:
+            ValueError: If a setting is invalid
+        """
+        return {
+            "intents": self.intents(),
+            "max_messages": self.max_messages,
+            "member_cache_flags": self.member_cache_flags(),
+            "chunk_guilds_at_startup": self.chunk_guilds
+        }
+    
+    def describe(self) -> str:
+        """One-line summary for startup logs."""
+        intents = sorted(name for name, enabled in self.intents() if enabled)
+        return (
+            f"max_messages={self.max_messages}, member_cache={self.member_cache}, "
+            f"chunk_guilds={self.chunk_guilds}, intents={','.join(intents)}"
+        )
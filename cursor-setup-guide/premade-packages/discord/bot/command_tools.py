@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Command Tools
+Decorators for caching command responses and rate-limiting commands per
+user, guild or channel on top of discord.py's cooldowns.
+"""
+
+import functools
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+import discord
+from discord.ext import commands
+
+# How a context maps to a cache or cooldown bucket. DMs have no guild, so
+# "guild" and "member" fall back to the DM channel. A commands.BucketType
+# works wherever a function does.
+BUCKETS: Dict[str, Callable[[commands.Context], Hashable]] = {
+    "global": lambda ctx: None,
+    "user": lambda ctx: ctx.author.id,
+    "guild": lambda ctx: ctx.guild.id if ctx.guild else ("dm", ctx.channel.id),
+    "channel": lambda ctx: ctx.channel.id,
+    "member": lambda ctx: (ctx.guild.id if ctx.guild else ("dm", ctx.channel.id), ctx.author.id)
+}
+
+BucketKey = Union[str, Callable[[commands.Context], Hashable]]
+
+
+def _bucket_function(bucket: BucketKey) -> Callable[[commands.Context], Hashable]:
+    if callable(bucket):
+        return bucket
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket} (expected one of {', '.join(BUCKETS)})")
+    return BUCKETS[bucket]
+
+
+class TTLCache:
+    """
+    Small LRU cache whose entries expire after a fixed number of seconds.
+    Not thread-safe; meant for use on the bot's event loop.
+    
+    Usage:
+        cache = TTLCache(ttl=30, max_size=1024)
+        cache.set(key, value)
+        value = cache.get(key)  # None once expired or evicted
+    """
+    
+    def __init__(self, ttl: float = 30.0, max_size: int = 1024):
+        """
+        Args:
+            ttl (float): Seconds an entry stays valid
+            max_size (int): Entries kept before the least recently used is evicted
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        # key -> (expires at, value)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._counts = {"hits": 0, "misses": 0, "evictions": 0}
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self._counts["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._counts["hits"] += 1
+        return entry[1]
+    
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._counts["evictions"] += 1
+    
+    def clear(self):
+        """Drop all entries."""
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters, the hit rate and the current size."""
+        stats = dict(self._counts)
+        stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def _send_kwargs(response: Any) -> Optional[Dict[str, Any]]:
+    """Turn a handler's return value into ctx.send() keyword arguments."""
+    if response is None:
+        return None
+    if isinstance(response, dict):
+        return response
+    if isinstance(response, discord.Embed):
+        return {"embed": response}
+    return {"content": str(response)}
+
+
+def cached_response(
+    ttl: float = 30.0,
+    per: BucketKey = "guild",
+    max_size: int = 1024
+) -> Callable:
+    """
+    Cache what a command sends, so repeated calls skip the handler.
+    
+    The decorated handler returns its response instead of sending it: a
+    string, a discord.Embed, or a dict of ctx.send() keyword arguments.
+    Returning None sends and caches nothing. Responses are cached per
+    command, bucket and command arguments; calls with unhashable arguments
+    are not cached.
+    
+    Usage:
+        @bot.command(name='info')
+        @cached_response(ttl=30, per="guild")
+        async def info(ctx):
+            return discord.Embed(title="Bot Information")
+    
+    Args:
+        ttl (float): Seconds a response is reused
+        per (str or callable): Bucket the cache key is scoped to (see BUCKETS),
+            or a function taking the context and returning a hashable key
+        max_size (int): Responses kept per command
+    
+    Returns:
+        Decorator for a command callback. The cache is available as
+        callback.response_cache
+    """
+    scope = _bucket_function(per)
+    
+    def decorator(func: Callable) -> Callable:
+        cache = TTLCache(ttl, max_size)
+        
+        @functools.wraps(func)
+        async def wrapper(ctx: commands.Context, *args, **kwargs):
+            key: Optional[Tuple] = (ctx.command.qualified_name, scope(ctx), args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                key = None
+            
+            response = cache.get(key) if key is not None else None
+            if response is None:
+                response = _send_kwargs(await func(ctx, *args, **kwargs))
+                if response is None:
+                    return
+                if key is not None:
+                    cache.set(key, response)
+            await ctx.send(**response)
+        
+        wrapper.response_cache = cache
+        return wrapper
+    
+    return decorator
+
+
+class NotifyingCooldown(commands.Cooldown):
+    """
+    discord.py Cooldown that remembers whether its current streak of
+    rejections has been reported, so the bot replies only once per burst.
+    """
+    
+    def __init__(self, rate: float, per: float):
+        super().__init__(rate, per)
+        self.notified = False
+
+
+class _StackedBucket(commands.Cooldown):
+    """
+    One invocation's buckets across stacked limits, e.g. per user and per
+    guild. A call is only counted once every limit allows it, so a limit
+    that rejects it doesn't use up the others. Created per invocation, so
+    `notify` belongs to the CommandOnCooldown raised for this call.
+    
+    Attributes:
+        notify (bool): True for the first rejection in the limiting bucket
+            since its last accepted call
+    """
+    
+    def __init__(self, buckets: List[commands.Cooldown]):
+        super().__init__(buckets[0].rate, buckets[0].per)
+        self.buckets = buckets
+        self.notify = False
+    
+    def get_tokens(self, current: Optional[float] = None) -> int:
+        return min(bucket.get_tokens(current) for bucket in self.buckets)
+    
+    def get_retry_after(self, current: Optional[float] = None) -> float:
+        return max(bucket.get_retry_after(current) for bucket in self.buckets)
+    
+    def update_rate_limit(self, current: Optional[float] = None, *, tokens: int = 1) -> Optional[float]:
+        current = current or time.time()
+        blocked = [bucket for bucket in self.buckets if bucket.get_tokens(current) < tokens]
+        if not blocked:
+            for bucket in self.buckets:
+                bucket.update_rate_limit(current, tokens=tokens)
+                if isinstance(bucket, NotifyingCooldown):
+                    bucket.notified = False
+            return None
+        
+        # Report the limit that lasts longest, as CommandOnCooldown.cooldown
+        limit = max(blocked, key=lambda bucket: bucket.get_retry_after(current))
+        self.rate, self.per = limit.rate, limit.per
+        self.notify = not getattr(limit, "notified", False)
+        for bucket in blocked:
+            if isinstance(bucket, NotifyingCooldown):
+                bucket.notified = True
+        return limit.get_retry_after(current)
+    
+    def reset(self):
+        for bucket in self.buckets:
+            bucket.reset()
+    
+    def copy(self) -> "_StackedBucket":
+        return _StackedBucket([bucket.copy() for bucket in self.buckets])
+
+
+class StackedCooldownMapping(commands.CooldownMapping):
+    """
+    CooldownMapping that checks several CooldownMappings together. Used as a
+    command's cooldown by the cooldown() decorator; Command.prepare() runs it
+    after checks and before argument parsing, like any discord.py cooldown.
+    """
+    
+    def __init__(self, limits: List[commands.CooldownMapping]):
+        super().__init__(limits[0]._cooldown, limits[0].type)
+        self.limits = limits
+    
+    def copy(self) -> "StackedCooldownMapping":
+        return StackedCooldownMapping([limit.copy() for limit in self.limits])
+    
+    @property
+    def valid(self) -> bool:
+        return any(limit.valid for limit in self.limits)
+    
+    def get_bucket(self, message: Any, current: Optional[float] = None) -> Optional[_StackedBucket]:
+        buckets = [limit.get_bucket(message, current) for limit in self.limits if limit.valid]
+        buckets = [bucket for bucket in buckets if bucket is not None]
+        return _StackedBucket(buckets) if buckets else None
+
+
+def cooldown(rate: int, per: float, bucket: BucketKey = "user") -> Callable:
+    """
+    Limit a command to `rate` calls per `per` seconds for each bucket.
+    
+    Built on discord.py's cooldowns: a rejected call raises
+    commands.CommandOnCooldown before arguments are parsed, before_invoke
+    hooks run or the handler is called. Unlike commands.cooldown, several
+    can be stacked for combined limits, e.g. per user and per guild; a call
+    counts against them only if all allow it. The error's cooldown has a
+    `notify` attribute that is True only for the first rejection of a
+    burst, so the error handler can stay quiet for the rest.
+    
+    Applying one decorator to several commands gives them a shared limit:
+        
+        per_user = cooldown(10, 30, "user")
+        for command in bot.walk_commands():
+            per_user(command)
+    
+    Args:
+        rate (int): Calls allowed per window
+        per (float): Window in seconds
+        bucket (str or callable): "user", "guild", "channel", "member",
+            "global", a commands.BucketType, or a function taking the
+            context and returning a key
+    
+    Returns:
+        Decorator for a command or command callback
+    """
+    if rate < 1 or per <= 0:
+        raise ValueError("rate must be at least 1 and per must be positive")
+    limit = commands.CooldownMapping(NotifyingCooldown(rate, per), _bucket_function(bucket))
+    
+    def decorator(func: Union[commands.Command, Callable]) -> Union[commands.Command, Callable]:
+        if isinstance(func, commands.Command):
+            current = func._buckets
+        else:
+            current = getattr(func, "__commands_cooldown__", None)
+        
+        if isinstance(current, StackedCooldownMapping):
+            limits = [limit, *current.limits]
+        elif current is not None and current.valid:
+            # Stacked on top of a plain commands.cooldown
+            limits = [limit, current]
+        else:
+            limits = [limit]
+        
+        if isinstance(func, commands.Command):
+            func._buckets = StackedCooldownMapping(limits)
+        else:
+            func.__commands_cooldown__ = StackedCooldownMapping(limits)
+        return func
+    
+    decorator.cooldown = limit
+    return decorator
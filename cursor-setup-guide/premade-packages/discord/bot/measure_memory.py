@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Bot Memory Measurement
+Measure per-guild cache memory for a cache configuration by feeding
+synthetic gateway payloads to discord.py's connection state. Nothing
+connects to Discord and no token is needed.
+"""
+
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import discord
+from discord.state import ConnectionState
+
+from cache_config import CacheConfig
+
+BOT_ID = 1
+TIMESTAMP = datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat()
+
+
+def user_payload(user_id: int) -> Dict[str, Any]:
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id}",
+        "global_name": f"User {user_id}",
+        "discriminator": "0",
+        "avatar": f"{user_id:032x}",
+        "bot": user_id == BOT_ID
+    }
+
+
+def member_payload(user_id: int, role_ids: List[int]) -> Dict[str, Any]:
+    return {
+        "user": user_payload(user_id),
+        "roles": [str(role_id) for role_id in role_ids],
+        "joined_at": TIMESTAMP,
+        "deaf": False,
+        "mute": False,
+        "flags": 0
+    }
+
+
+def guild_payload(
+    guild_id: int,
+    intents: discord.Intents,
+    channels: int,
+    roles: int,
+    members: int,
+    voice: int
+) -> Dict[str, Any]:
+    """
+    A GUILD_CREATE payload as Discord would send it for the given intents.
+    
+    Approximates Discord's intent filtering: without the members intent the
+    member list only holds the bot and members in voice, and voice states
+    are only sent with the voice_states intent.
+    """
+    base = guild_id * 100_000
+    role_ids = [base + 1 + i for i in range(roles)]
+    user_ids = [base + 50_000 + i for i in range(members)]
+    voice_channel = base + 20_000
+    
+    channel_payloads = [
+        {
+            "id": str(base + 10_000 + i),
+            "type": 0,
+            "name": f"channel-{i}",
+            "position": i,
+            "topic": "A synthetic text channel used to measure cache memory",
+            "nsfw": False,
+            "rate_limit_per_user": 0,
+            "parent_id": None,
+            "permission_overwrites": []
+        }
+        for i in range(channels)
+    ]
+    channel_payloads.append({
+        "id": str(voice_channel),
+        "type": 2,
+        "name": "voice",
+        "position": channels,
+        "bitrate": 64000,
+        "user_limit": 0,
+        "parent_id": None,
+        "permission_overwrites": []
+    })
+    
+    voice_states = []
+    if intents.voice_states:
+        voice_states = [
+            {
+                "user_id": str(user_id),
+                "channel_id": str(voice_channel),
+                "session_id": f"{user_id:032x}",
+                "deaf": False,
+                "mute": False,
+                "self_deaf": False,
+                "self_mute": False,
+                "self_video": False,
+                "suppress": False,
+                "request_to_speak_timestamp": None
+            }
+            for user_id in user_ids[:voice]
+        ]
+    
+    if intents.members:
+        listed = user_ids
+    else:
+        listed = [int(state["user_id"]) for state in voice_states]
+    member_payloads = [member_payload(BOT_ID, [])]
+    member_payloads += [member_payload(user_id, role_ids[:3]) for user_id in listed]
+    
+    return {
+        "id": str(guild_id),
+        "name": f"Guild {guild_id}",
+        "icon": None,
+        "owner_id": str(user_ids[0] if user_ids else BOT_ID),
+        "afk_timeout": 300,
+        "verification_level": 0,
+        "default_message_notifications": 0,
+        "explicit_content_filter": 0,
+        "mfa_level": 0,
+        "premium_tier": 0,
+        "preferred_locale": "en-US",
+        "features": [],
+        "member_count": members + 1,
+        "large": members + 1 >= 250,
+        "roles": [
+            {"id": str(guild_id), "name": "@everyone", "color": 0, "hoist": False, "position": 0,
+             "permissions": "0", "managed": False, "mentionable": False}
+        ] + [
+            {"id": str(role_id), "name": f"role-{i}", "color": 0x3498db, "hoist": False, "position": i + 1,
+             "permissions": "104324673", "managed": False, "mentionable": True}
+            for i, role_id in enumerate(role_ids)
+        ],
+        "emojis": [],
+        "stickers": [],
+        "channels": channel_payloads,
+        "threads": [],
+        "members": member_payloads,
+        "voice_states": voice_states,
+        "presences": []
+    }
+
+
+def message_payload(message_id: int, guild_id: int, channel_id: int, user_id: int) -> Dict[str, Any]:
+    return {
+        "id": str(message_id),
+        "channel_id": str(channel_id),
+        "guild_id": str(guild_id),
+        "author": user_payload(user_id),
+        "member": {"roles": [], "joined_at": TIMESTAMP, "deaf": False, "mute": False, "flags": 0},
+        "content": f"Synthetic message {message_id} with a typical amount of chat text in it",
+        "timestamp": TIMESTAMP,
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0
+    }
+
+
+def library_default_options() -> Dict[str, Any]:
+    """The bot's previous setup: default intents plus message content, library cache defaults."""
+    intents = discord.Intents.default()
+    intents.message_content = True
+    return {"intents": intents}
+
+
+def measure(
+    options: Dict[str, Any],
+    guilds: int = 100,
+    channels: int = 20,
+    roles: int = 20,
+    members: int = 500,
+    voice: int = 5,
+    messages: int = 5000,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Load synthetic guilds and messages into a fresh connection state.
+    
+    Args:
+        options (dict): discord.Client options (intents, max_messages, ...)
+        guilds (int): Guilds to load
+        channels (int): Text channels per guild
+        roles (int): Roles per guild
+        members (int): Members per guild (sent only with the members intent)
+        voice (int): Members in voice per guild
+        messages (int): MESSAGE_CREATE events spread across all guilds
+        seed (int): Random seed for message placement
+    
+    Returns:
+        dict: Memory per guild and per cached message in bytes, plus counts
+    """
+    rng = random.Random(seed)
+    intents = options.get("intents") or discord.Intents.default()
+    
+    gc.collect()
+    tracemalloc.start()
+    try:
+        state = ConnectionState(
+            dispatch=lambda *args, **kwargs: None,
+            handlers={},
+            hooks={},
+            http=None,
+            **options
+        )
+        state.user = discord.ClientUser(state=state, data=dict(user_payload(BOT_ID), verified=True, mfa_enabled=False))
+        gc.collect()
+        start = tracemalloc.get_traced_memory()[0]
+        
+        for guild_id in range(1, guilds + 1):
+            # The payload is garbage once parsed; only what the cache keeps stays traced
+            state._add_guild_from_data(guild_payload(guild_id, intents, channels, roles, members, voice))
+        gc.collect()
+        after_guilds = tracemalloc.get_traced_memory()[0]
+        
+        if intents.guild_messages:
+            for message_id in range(1, messages + 1):
+                guild_id = rng.randint(1, guilds)
+                channel_id = guild_id * 100_000 + 10_000 + rng.randrange(channels)
+                user_id = guild_id * 100_000 + 50_000 + rng.randrange(members)
+                state.parse_message_create(message_payload(10**12 + message_id, guild_id, channel_id, user_id))
+        gc.collect()
+        after_messages = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    
+    cached_messages = len(state._messages) if state._messages is not None else 0
+    return {
+        "guilds": guilds,
+        "bytes_per_guild": round((after_guilds - start) / guilds),
+        "guild_cache_bytes": after_guilds - start,
+        "message_cache_bytes": after_messages - after_guilds,
+        "bytes_per_message": round((after_messages - after_guilds) / cached_messages) if cached_messages else 0,
+        "cached_messages": cached_messages,
+        "cached_members": sum(len(guild._members) for guild in state.guilds),
+        "voice_states": sum(len(guild._voice_states) for guild in state.guilds),
+        "total_bytes": after_messages - start
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure bot cache memory with synthetic gateway payloads (no Discord connection)"
+    )
+    parser.add_argument("--guilds", type=int, default=100, help="Guilds to load")
+    parser.add_argument("--channels", type=int, default=20, help="Text channels per guild")
+    parser.add_argument("--roles", type=int, default=20, help="Roles per guild")
+    parser.add_argument("--members", type=int, default=500, help="Members per guild")
+    parser.add_argument("--voice", type=int, default=5, help="Members in voice per guild")
+    parser.add_argument("--messages", type=int, default=5000, help="Messages received in total")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    
+    # "configured" reads BOT_* from the environment, so different settings
+    # can be compared by running e.g. BOT_MEMBER_CACHE=joined python measure_memory.py
+    config = CacheConfig.from_env()
+    configurations = {
+        "library defaults": library_default_options(),
+        "configured": config.bot_options()
+    }
+    sizes = dict(
+        guilds=args.guilds,
+        channels=args.channels,
+        roles=args.roles,
+        members=args.members,
+        voice=args.voice,
+        messages=args.messages
+    )
+    results = {name: measure(options, **sizes) for name, options in configurations.items()}
+    
+    if args.json:
+        print(json.dumps({"sizes": sizes, "config": config.describe(), "results": results}, indent=2))
+        return
+    
+    print(f"Configured: {config.describe()}")
+    print(f"{'configuration':<18} {'KiB/guild':>10} {'members':>8} {'voice':>6} {'messages':>9} "
+          f"{'msg cache KiB':>14} {'total KiB':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<18} {result['bytes_per_guild'] / 1024:>10.1f} {result['cached_members']:>8} "
+            f"{result['voice_states']:>6} {result['cached_messages']:>9} "
+            f"{result['message_cache_bytes'] / 1024:>14.1f} {result['total_bytes'] / 1024:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
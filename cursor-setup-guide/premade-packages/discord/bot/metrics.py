@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Bot Metrics
+Queue-based logging, event-loop lag monitoring and command timing.
+"""
+
+import asyncio
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, TextIO
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class QueueLogging:
+    """
+    Logger whose records are written by a background thread.
+    
+    Logging from a coroutine only puts the record on a queue, so a slow
+    terminal or log file never blocks the event loop.
+    
+    Usage:
+        log = QueueLogging("bot")
+        log.logger.info("Message from %s", author)
+        ...
+        log.stop()  # flushes queued records
+    """
+    
+    def __init__(
+        self,
+        name: str = "bot",
+        level: int = logging.INFO,
+        max_queue: int = 10_000,
+        stream: Optional[TextIO] = None,
+        fmt: str = "%(asctime)s %(levelname)s %(message)s"
+    ):
+        """
+        Args:
+            name (str): Logger name
+            level (int): Minimum level to log
+            max_queue (int): Records held before new ones are dropped
+            stream (file, optional): Output stream. Defaults to stdout
+            fmt (str): Record format
+        """
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._handler = _DroppingQueueHandler(self._queue)
+        
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(level)
+        self.logger.addHandler(self._handler)
+        self.logger.propagate = False
+        
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(logging.Formatter(fmt))
+        self._listener = logging.handlers.QueueListener(self._queue, output)
+        self._listener.start()
+    
+    @property
+    def pending(self) -> int:
+        """Records waiting to be written."""
+        return self._queue.qsize()
+    
+    @property
+    def dropped(self) -> int:
+        """Records dropped because the queue was full."""
+        return self._handler.dropped
+    
+    def stop(self):
+        """Write the remaining records and stop the writer thread."""
+        self._listener.stop()
+        self.logger.removeHandler(self._handler)
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    """Average, p95 and max in milliseconds."""
+    if not values:
+        return {"avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(values)
+    p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+    return {
+        "avg_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+class BotMetrics:
+    """
+    Event-loop lag and per-command timing for a running bot.
+    
+    Lag is measured by sleeping for a fixed interval and recording how much
+    later than requested the loop woke up: anything blocking the loop shows
+    up as lag. Summaries cover the most recent window of samples.
+    """
+    
+    def __init__(self, lag_interval: float = 0.25, window: int = 1000, log: Optional[QueueLogging] = None):
+        """
+        Args:
+            lag_interval (float): Seconds between lag samples
+            window (int): Samples kept per series
+            log (QueueLogging, optional): Logger whose queue depth is reported
+        """
+        self.lag_interval = lag_interval
+        self.window = window
+        self.log = log
+        self.started = time.monotonic()
+        self.messages = 0
+        self.lag: Deque[float] = deque(maxlen=window)
+        self._durations: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._tasks: List[asyncio.Task] = []
+    
+    def record_command(self, name: str, seconds: float, failed: bool = False):
+        """Record one command invocation."""
+        self._durations.setdefault(name, deque(maxlen=self.window)).append(seconds)
+        counts = self._counts.setdefault(name, {"calls": 0, "errors": 0})
+        counts["calls"] += 1
+        if failed:
+            counts["errors"] += 1
+    
+    async def _monitor_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            self.lag.append(max(loop.time() - start - self.lag_interval, 0.0))
+    
+    async def _dump_periodically(self, path: str, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            # Snapshot on the loop (the deques aren't thread-safe to iterate),
+            # write in a thread so file I/O can't add lag itself
+            await asyncio.to_thread(self.dump, path, self.snapshot())
+    
+    def start(self, dump_path: Optional[str] = None, dump_interval: float = 60.0):
+        """
+        Start lag monitoring (and periodic dumps) on the running event loop.
+        
+        Args:
+            dump_path (str, optional): JSON file to write snapshots to
+            dump_interval (float): Seconds between dumps
+        """
+        self._tasks.append(asyncio.create_task(self._monitor_lag()))
+        if dump_path:
+            self._tasks.append(asyncio.create_task(self._dump_periodically(dump_path, dump_interval)))
+    
+    def stop(self):
+        """Cancel the background tasks."""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return current metrics as a JSON-serializable dict."""
+        lag = list(self.lag)
+        snapshot = {
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+            "messages_seen": self.messages,
+            "loop_lag": dict(_summary(lag), last_ms=round(lag[-1] * 1000, 3) if lag else 0.0),
+            "commands": {
+                name: dict(self._counts[name], **_summary(list(durations)))
+                for name, durations in sorted(self._durations.items())
+            }
+        }
+        if self.log:
+            snapshot["logging"] = {"pending": self.log.pending, "dropped": self.log.dropped}
+        return snapshot
+    
+    def dump(self, path: str, snapshot: Optional[Dict[str, Any]] = None):
+        """
+        Write a snapshot to a JSON file, replacing it atomically.
+        
+        Args:
+            path (str): Output file
+            snapshot (dict, optional): Snapshot to write. Defaults to a new one
+        """
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(snapshot or self.snapshot(), f, indent=2)
+        os.replace(temp_path, path)
@@ -4,20 +4,10 @@ Discord Webhook Embed Sender
 Send rich embeds to Discord using webhooks.
 """
 
-import requests
-import json
-import os
-from datetime import datetime
-from dotenv import load_dotenv
+from webhook_client import WebhookClient, build_embed
 
-# Load environment variables
-load_dotenv()
-
-WEBHOOK_URL = os.getenv("WEBHOOK_URL")
-
-if not WEBHOOK_URL:
-    print("Error: WEBHOOK_URL not found in environment variables")
-    exit(1)
+# Default client for WEBHOOK_URL; configuration is read on the first send
+client = WebhookClient()
 
 
 def send_webhook_embed(title, description, color=0x00ff00, fields=None, footer=None):
@@ -34,25 +24,20 @@ def send_webhook_embed(title, description, color=0x00ff00, fields=None, footer=N
     Returns:
         bool: True if successful, False otherwise
     """
-    embed = {
-        "title": title,
-        "description": description,
-        "color": color,
-        "timestamp": datetime.utcnow().isoformat()
+    payload = {
+        "embeds": [build_embed(title, description, color, fields, footer)]
     }
     
-    if fields:
-        embed["fields"] = fields
+    if not client.configured:
+        print("Error: WEBHOOK_URL not found in environment variables")
+        return False
     
-    if footer:
-        embed["footer"] = {"text": footer}
-    
-    payload = {
-        "embeds": [embed]
-    }
+    # Imported on first send so importing this module stays cheap
+    import requests
     
     try:
-        response = requests.post(WEBHOOK_URL, json=payload)
+        # Shared session; waits on Discord's rate limit instead of failing
+        response = client.post(payload)
         
         if response.status_code == 204:
             print("Embed sent successfully!")
@@ -61,13 +46,19 @@ def send_webhook_embed(title, description, color=0x00ff00, fields=None, footer=N
             print(f"Failed to send embed. Status code: {response.status_code}")
             print(f"Response: {response.text}")
             return False
-            
+    
     except requests.exceptions.RequestException as e:
         print(f"An error occurred: {e}")
         return False
 
 
 if __name__ == "__main__":
+    import sys
+    
+    if not client.configured:
+        print("Error: WEBHOOK_URL not found in environment variables")
+        sys.exit(1)
+    
     # Example: Send an embed with fields
     fields = [
         {"name": "Field 1", "value": "Value 1", "inline": True},
@@ -82,4 +73,3 @@ if __name__ == "__main__":
         fields=fields,
         footer="Sent via webhook"
     )
-
@@ -4,22 +4,12 @@ Discord Webhook Sender
 Send messages to Discord using webhooks.
 """
 
-import requests
-import json
-import os
 import sys
-import argparse
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from webhook_client import WebhookClient
 
-WEBHOOK_URL = os.getenv("WEBHOOK_URL")
-
-if not WEBHOOK_URL:
-    print("Error: WEBHOOK_URL not found in environment variables")
-    print("Create a .env file with: WEBHOOK_URL=your_webhook_url_here")
-    sys.exit(1)
+# Default client for WEBHOOK_URL; configuration is read on the first send
+client = WebhookClient()
 
 
 def send_webhook_message(content, username=None, avatar_url=None):
@@ -44,8 +34,16 @@ def send_webhook_message(content, username=None, avatar_url=None):
     if avatar_url:
         payload["avatar_url"] = avatar_url
     
+    if not client.configured:
+        print("Error: WEBHOOK_URL not found in environment variables")
+        return False
+    
+    # Imported on first send so importing this module stays cheap
+    import requests
+    
     try:
-        response = requests.post(WEBHOOK_URL, json=payload)
+        # Shared session; waits on Discord's rate limit instead of failing
+        response = client.post(payload)
         
         if response.status_code == 204:
             print("Message sent successfully!")
@@ -54,13 +52,15 @@ def send_webhook_message(content, username=None, avatar_url=None):
             print(f"Failed to send message. Status code: {response.status_code}")
             print(f"Response: {response.text}")
             return False
-            
+    
     except requests.exceptions.RequestException as e:
         print(f"An error occurred: {e}")
         return False
 
 
 if __name__ == "__main__":
+    import argparse
+    
     parser = argparse.ArgumentParser(description="Send message to Discord via webhook")
     parser.add_argument("message", help="Message to send")
     parser.add_argument("--username", "-u", help="Custom username")
@@ -68,5 +68,9 @@ if __name__ == "__main__":
     
     args = parser.parse_args()
     
+    if not client.configured:
+        print("Error: WEBHOOK_URL not found in environment variables")
+        print("Create a .env file with: WEBHOOK_URL=your_webhook_url_here")
+        sys.exit(1)
+    
     send_webhook_message(args.message, args.username, args.avatar)
-
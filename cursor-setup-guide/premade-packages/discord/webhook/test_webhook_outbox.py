@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Tests for WebhookOutbox worker error handling.
+Run with: python -m pytest test_webhook_outbox.py
+"""
+
+from webhook_outbox import WebhookOutbox
+from webhook_sender import WebhookSender
+
+
+class BrokenSender(WebhookSender):
+    """Sender whose requests fail with an error that isn't a RequestException."""
+    
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+    
+    def post(self, url, payload):
+        self.calls += 1
+        raise ValueError("malformed response")
+
+
+def test_unexpected_error_dead_letters_and_keeps_worker_alive(tmp_path):
+    sender = BrokenSender()
+    outbox = WebhookOutbox(str(tmp_path / "outbox.db"), workers=1, max_attempts=2, backoff=0.01, sender=sender)
+    outbox.start()
+    try:
+        outbox.enqueue("http://127.0.0.1:9/a", {"content": "first"})
+        outbox.enqueue("http://127.0.0.1:9/a", {"content": "second"})
+        assert outbox.wait_idle(timeout=5)
+        
+        status = outbox.status()
+        assert status["dead"] == 2
+        assert sender.calls == 4
+        assert not outbox._busy
+        assert all(thread.is_alive() for thread in outbox._threads)
+    finally:
+        outbox.close()
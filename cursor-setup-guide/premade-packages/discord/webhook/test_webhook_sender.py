@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for WebhookSender against a local HTTP server.
+Run with: python -m pytest test_webhook_sender.py
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from webhook_sender import WebhookSender
+
+
+class FakeWebhook:
+    """Local server that answers each POST with the next queued response."""
+    
+    def __init__(self, responses):
+        # (status, headers, body) tuples; the last one repeats
+        self.responses = list(responses)
+        self.requests = 0
+        fake = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                index = min(fake.requests, len(fake.responses) - 1)
+                fake.requests += 1
+                status, headers, body = fake.responses[index]
+                data = json.dumps(body).encode("utf-8") if body is not None else b""
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/webhook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def webhook(request):
+    fake = FakeWebhook(request.param)
+    yield fake
+    fake.close()
+
+
+def send_with_timeout(sender, url, payload, timeout=5.0):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("ok", sender.send(url, payload)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "send() hung"
+    return result["ok"]
+
+
+@pytest.mark.parametrize("webhook", [[
+    (429, {"Content-Type": "application/json"}, {"retry_after": 0.1, "global": False}),
+    (204, {}, None)
+]], indirect=True)
+def test_headerless_429_is_retried_instead_of_hanging(webhook):
+    with WebhookSender() as sender:
+        assert send_with_timeout(sender, webhook.url, {"content": "hi"})
+        assert webhook.requests == 2
+        # And the bucket keeps working afterwards
+        assert send_with_timeout(sender, webhook.url, {"content": "again"})
+
+
+@pytest.mark.parametrize("webhook", [[
+    (204, {"X-RateLimit-Limit": "5", "X-RateLimit-Remaining": "not-a-number", "X-RateLimit-Reset-After": "1"}, None)
+]], indirect=True)
+def test_malformed_rate_limit_headers_are_ignored(webhook):
+    with WebhookSender() as sender:
+        for _ in range(3):
+            assert send_with_timeout(sender, webhook.url, {"content": "hi"})
+
+
+@pytest.mark.parametrize("webhook", [[(204, {}, None)]], indirect=True)
+def test_unencodable_payload_fails_its_future_and_not_the_queue(webhook):
+    with WebhookSender(workers=1) as sender:
+        bad = sender.queue(webhook.url, {"content": object()})
+        good = sender.queue(webhook.url, {"content": "fine"})
+        assert sender.flush(timeout=5)
+        assert isinstance(bad.exception(timeout=0), TypeError)
+        assert good.result(timeout=0) is True
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Discord Webhook Client
+Importable webhook client with lazy configuration and no import-time side effects.
+"""
+
+import os
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+    
+    import requests
+    
+    from webhook_sender import WebhookSender
+
+_dotenv_loaded = False
+
+
+def _getenv(name: str) -> Optional[str]:
+    """Read an environment variable, loading .env on first use."""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
+    return os.getenv(name)
+
+
+def build_embed(
+    title: str,
+    description: str,
+    color: int = 0x00ff00,
+    fields: Optional[List[Dict[str, Any]]] = None,
+    footer: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build an embed dict.
+    
+    Args:
+        title (str): Embed title
+        description (str): Embed description
+        color (int): Embed color (hex color code)
+        fields (list, optional): List of dicts with 'name' and 'value' keys
+        footer (str, optional): Footer text
+    
+    Returns:
+        dict: Embed ready for a payload's "embeds" list
+    """
+    embed = {
+        "title": title,
+        "description": description,
+        "color": color,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    
+    if fields:
+        embed["fields"] = fields
+    
+    if footer:
+        embed["footer"] = {"text": footer}
+    
+    return embed
+
+
+class WebhookClient:
+    """
+    Send messages to one webhook.
+    
+    Nothing is read, imported or connected until the first send, so the
+    module is safe to import anywhere and one process can hold a client per
+    webhook. All clients share the process-wide WebhookSender (one pooled
+    session with rate-limit handling) unless given their own.
+    
+    Usage:
+        alerts = WebhookClient("https://discord.com/api/webhooks/...")
+        alerts.send_message("Deploy finished")
+        
+        # URL from WEBHOOK_URL in the environment or .env
+        WebhookClient().send_embed("Build", "All tests passed")
+    """
+    
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        username: Optional[str] = None,
+        avatar_url: Optional[str] = None,
+        sender: Optional["WebhookSender"] = None
+    ):
+        """
+        Args:
+            url (str, optional): Webhook URL. Defaults to WEBHOOK_URL, read on first use
+            username (str, optional): Default username for messages
+            avatar_url (str, optional): Default avatar URL for messages
+            sender (WebhookSender, optional): Sender to use. Defaults to the shared one
+        """
+        self._url = url
+        self.username = username
+        self.avatar_url = avatar_url
+        self._sender = sender
+    
+    @property
+    def url(self) -> str:
+        """Webhook URL. Raises ValueError if none was given or configured."""
+        if self._url is None:
+            self._url = _getenv("WEBHOOK_URL")
+            if not self._url:
+                raise ValueError("No webhook URL: pass url= or set WEBHOOK_URL")
+        return self._url
+    
+    @property
+    def configured(self) -> bool:
+        """True if a webhook URL is available."""
+        try:
+            return bool(self.url)
+        except ValueError:
+            return False
+    
+    @property
+    def sender(self) -> "WebhookSender":
+        if self._sender is None:
+            # Imports requests; deferred so importing this module stays cheap
+            from webhook_sender import get_default_sender
+            self._sender = get_default_sender()
+        return self._sender
+    
+    def _payload(self, payload: Dict[str, Any], username: Optional[str], avatar_url: Optional[str]) -> Dict[str, Any]:
+        username = username or self.username
+        avatar_url = avatar_url or self.avatar_url
+        if username:
+            payload["username"] = username
+        if avatar_url:
+            payload["avatar_url"] = avatar_url
+        return payload
+    
+    def post(self, payload: Dict[str, Any]) -> "requests.Response":
+        """
+        POST a raw payload, waiting on the rate limit.
+        
+        Raises:
+            ValueError: If no webhook URL is configured
+            requests.exceptions.RequestException: On connection errors
+        """
+        return self.sender.post(self.url, payload)
+    
+    def send(self, payload: Dict[str, Any]) -> bool:
+        """
+        Send a raw payload.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.sender.send(self.url, payload)
+    
+    def send_message(self, content: str, username: Optional[str] = None, avatar_url: Optional[str] = None) -> bool:
+        """
+        Send a text message.
+        
+        Args:
+            content (str): Message content
+            username (str, optional): Custom username for this message
+            avatar_url (str, optional): Custom avatar URL for this message
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.send(self._payload({"content": content}, username, avatar_url))
+    
+    def send_embed(
+        self,
+        title: str,
+        description: str,
+        color: int = 0x00ff00,
+        fields: Optional[List[Dict[str, Any]]] = None,
+        footer: Optional[str] = None
+    ) -> bool:
+        """
+        Send an embed. Arguments as for build_embed().
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        embed = build_embed(title, description, color, fields, footer)
+        return self.send(self._payload({"embeds": [embed]}, None, None))
+    
+    def queue_embed(self, embed: Dict[str, Any]) -> "Future":
+        """Queue an embed for batched background delivery. See WebhookSender.queue()."""
+        return self.sender.queue(self.url, self._payload({"embeds": [embed]}, None, None))
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Discord Webhook Outbox
+Durable webhook delivery queue backed by SQLite.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import requests
+
+from webhook_sender import WebhookSender, get_default_sender
+
+
+class WebhookOutbox:
+    """
+    Durable outbound webhook queue backed by SQLite.
+    
+    enqueue() only writes a row and returns. Worker threads deliver messages
+    through a WebhookSender, so Discord's rate limits are respected, in order
+    per webhook: a webhook's next message is not sent until the previous one
+    was delivered or dead-lettered. Failures are retried with exponential
+    backoff. Messages that were pending or in flight when the process stopped
+    are delivered after the next start.
+    
+    Usage:
+        outbox = WebhookOutbox("webhooks.db")
+        outbox.start()
+        outbox.enqueue(WEBHOOK_URL, {"content": "Backup finished"})
+        ...
+        outbox.close()
+    """
+    
+    def __init__(
+        self,
+        db_path: str = "webhook_outbox.db",
+        workers: int = 4,
+        max_attempts: int = 8,
+        backoff: float = 5.0,
+        max_backoff: float = 600.0,
+        sender: Optional[WebhookSender] = None
+    ):
+        """
+        Args:
+            db_path (str): SQLite file for the queue
+            workers (int): Delivery threads. Different webhooks are delivered
+                in parallel; each webhook is delivered by one thread at a time
+            max_attempts (int): Attempts before a message is dead-lettered
+            backoff (float): Delay in seconds before the first retry; doubles
+                on each further attempt
+            max_backoff (float): Longest delay between attempts
+            sender (WebhookSender, optional): Sender to deliver through.
+                Defaults to the shared sender
+        """
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sender = sender or get_default_sender()
+        
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # Webhooks with a message in flight, to keep per-webhook order
+        self._busy: Set[str] = set()
+        
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "webhook TEXT NOT NULL, "
+                "payload TEXT NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'pending', "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt_at REAL NOT NULL, "
+                "last_error TEXT, "
+                "created_at REAL NOT NULL, "
+                "sent_at REAL)"
+            )
+            # Finds the oldest pending message of each webhook
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outbox_head "
+                "ON outbox (status, webhook, id)"
+            )
+            # Restart recovery: a send that was in flight may not have completed
+            self._connection.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+    
+    def enqueue(self, url: str, payload: Dict[str, Any]) -> int:
+        """
+        Queue a webhook message for background delivery.
+        
+        Args:
+            url (str): Webhook URL
+            payload (dict): Message payload, e.g. {"content": "..."}
+        
+        Returns:
+            int: Message id
+        """
+        now = time.time()
+        with self._condition:
+            with self._connection:
+                cursor = self._connection.execute(
+                    "INSERT INTO outbox (webhook, payload, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (url, json.dumps(payload), now, now)
+                )
+            self._condition.notify()
+        return cursor.lastrowid
+    
+    def _claim(self) -> Tuple[Optional[tuple], Optional[float]]:
+        """
+        Mark the next deliverable message as sending. Caller holds the lock.
+        
+        Returns:
+            tuple: (row or None, seconds to wait before trying again, or None
+            to wait until a message is enqueued or a delivery finishes)
+        """
+        now = time.time()
+        # Only the oldest pending message of each webhook may be sent
+        heads = self._connection.execute(
+            "SELECT id, webhook, payload, attempts, next_attempt_at FROM outbox "
+            "WHERE id IN (SELECT MIN(id) FROM outbox WHERE status = 'pending' GROUP BY webhook) "
+            "ORDER BY next_attempt_at, id"
+        ).fetchall()
+        
+        shortest = None
+        for message_id, webhook, payload, attempts, next_attempt_at in heads:
+            if webhook in self._busy:
+                continue
+            wait = max(next_attempt_at - now, self.sender.delay(webhook))
+            if wait <= 0:
+                with self._connection:
+                    self._connection.execute("UPDATE outbox SET status = 'sending' WHERE id = ?", (message_id,))
+                self._busy.add(webhook)
+                return (message_id, webhook, payload, attempts), 0.0
+            shortest = wait if shortest is None else min(shortest, wait)
+        return None, shortest
+    
+    def _finish(self, message_id: int, webhook: str, attempts: int, error: Optional[str], permanent: bool):
+        """Record the outcome of one delivery attempt."""
+        now = time.time()
+        with self._condition:
+            try:
+                self._record(message_id, attempts, error, permanent, now)
+            finally:
+                # Even if the update failed, the webhook's next message may now be sent
+                self._busy.discard(webhook)
+                self._condition.notify_all()
+    
+    def _record(self, message_id: int, attempts: int, error: Optional[str], permanent: bool, now: float):
+        """Write one delivery outcome. Caller holds the lock."""
+        with self._connection:
+            if error is None:
+                self._connection.execute(
+                    "UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ?, last_error = NULL "
+                    "WHERE id = ?",
+                    (attempts, now, message_id)
+                )
+            elif permanent or attempts >= self.max_attempts:
+                self._connection.execute(
+                    "UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, error, message_id)
+                )
+            else:
+                delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+                delay *= random.uniform(0.8, 1.2)
+                self._connection.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = ?, last_error = ?, "
+                    "next_attempt_at = ? WHERE id = ?",
+                    (attempts, error, now + delay, message_id)
+                )
+    
+    def _work(self):
+        while not self._stopped.is_set():
+            with self._condition:
+                row, wait = self._claim()
+                if row is None:
+                    self._condition.wait(wait)
+                    continue
+            
+            message_id, webhook, payload, attempts = row
+            error = None
+            permanent = False
+            try:
+                # Stored JSON is sent as is, without decoding it again
+                response = self.sender.post(webhook, payload.encode("utf-8"))
+                if response.status_code not in (200, 204):
+                    error = f"HTTP {response.status_code}: {response.text[:500]}"
+                    # 4xx other than 429 (bad payload, deleted webhook) won't succeed later
+                    permanent = 400 <= response.status_code < 500 and response.status_code != 429
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+            except Exception as e:
+                # Anything else is retried with backoff and dead-lettered
+                # after max_attempts, instead of killing the worker
+                error = f"{type(e).__name__}: {e}"
+            try:
+                self._finish(message_id, webhook, attempts + 1, error, permanent)
+            except sqlite3.Error as e:
+                # The row stays 'sending' and is retried after the next start
+                print(f"Error recording delivery of message {message_id}: {e}")
+    
+    def start(self):
+        """Start the delivery workers."""
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self):
+        """Stop the workers after their current message. Queued messages stay queued."""
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+    
+    def close(self):
+        """Stop the workers and close the database."""
+        self.stop()
+        with self._lock:
+            self._connection.close()
+    
+    def wait_idle(self, timeout: Optional[float] = None, poll: float = 0.05) -> bool:
+        """
+        Wait until nothing is pending or in flight. Retries in backoff count as pending.
+        
+        Returns:
+            bool: False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status()
+            if status["pending"] + status["sending"] == 0:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+    
+    def status(self, window: float = 60.0) -> Dict[str, Any]:
+        """
+        Report queue depth and throughput.
+        
+        Args:
+            window (float): Seconds over which throughput is measured
+        
+        Returns:
+            dict: Message counts per status, sent_per_second and
+            oldest_pending_age in seconds
+        """
+        now = time.time()
+        with self._lock:
+            counts = dict(self._connection.execute(
+                "SELECT status, COUNT(*) FROM outbox GROUP BY status"
+            ).fetchall())
+            recent = self._connection.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = 'sent' AND sent_at >= ?",
+                (now - window,)
+            ).fetchone()[0]
+            oldest = self._connection.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+        
+        return {
+            "pending": counts.get("pending", 0),
+            "sending": counts.get("sending", 0),
+            "sent": counts.get("sent", 0),
+            "dead": counts.get("dead", 0),
+            "sent_per_second": recent / window,
+            "oldest_pending_age": now - oldest if oldest else 0.0
+        }
+    
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return dead-lettered messages with their last error."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, webhook, payload, attempts, last_error FROM outbox "
+                "WHERE status = 'dead' ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {
+                "id": message_id,
+                "webhook": webhook,
+                "payload": json.loads(payload),
+                "attempts": attempts,
+                "last_error": last_error
+            }
+            for message_id, webhook, payload, attempts, last_error in rows
+        ]
+    
+    def requeue_dead(self, ids: Optional[List[int]] = None) -> int:
+        """
+        Move dead-lettered messages back to the queue.
+        
+        A requeued message goes ahead of its webhook's other pending messages,
+        since those are ordered by id. Messages already sent stay sent.
+        
+        Args:
+            ids (list, optional): Message ids. Defaults to all dead messages
+        
+        Returns:
+            int: Number of messages requeued
+        """
+        query = "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'dead'"
+        params: List[Any] = [time.time()]
+        if ids is not None:
+            query += f" AND id IN ({', '.join('?' for _ in ids)})"
+            params.extend(ids)
+        
+        with self._condition:
+            with self._connection:
+                count = self._connection.execute(query, params).rowcount
+            self._condition.notify_all()
+        return count
+    
+    def purge_sent(self, older_than: float = 86400.0) -> int:
+        """Delete sent messages older than the given number of seconds."""
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?",
+                (time.time() - older_than,)
+            ).rowcount
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
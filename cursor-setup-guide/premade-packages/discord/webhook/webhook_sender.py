@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Discord Webhook Sender
+Rate-limit-aware webhook delivery with a shared session, queuing and embed batching.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Discord limits for a single webhook message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+# Payloads with only these keys can be merged into one multi-embed message
+_BATCHABLE_KEYS = {"embeds", "username", "avatar_url"}
+
+
+def _embed_chars(embed: Dict[str, Any]) -> int:
+    """Count the embed characters Discord adds up against MAX_EMBED_CHARS."""
+    total = len(embed.get("title", "")) + len(embed.get("description", ""))
+    total += len(embed.get("footer", {}).get("text", ""))
+    total += len(embed.get("author", {}).get("name", ""))
+    for field in embed.get("fields", ()):
+        total += len(field.get("name", "")) + len(field.get("value", ""))
+    return total
+
+
+def _is_batchable(payload: Dict[str, Any]) -> bool:
+    return bool(payload.get("embeds")) and set(payload) <= _BATCHABLE_KEYS
+
+
+class _Bucket:
+    """Rate-limit state for one webhook, updated from response headers."""
+    
+    def __init__(self):
+        # Until the first response gives the limit, send one probe at a time
+        self.limit: Optional[int] = None
+        self.remaining = 1
+        self.reset_at = 0.0
+        # Longest reset-after seen, as an estimate of the window length
+        self.window = 0.0
+        # Requests sent but not answered; the server may not have counted them
+        self.outgoing = 0
+        self.cond = threading.Condition()
+    
+    def delay(self) -> float:
+        """Seconds until a request may be sent."""
+        if self.remaining > 0:
+            return 0.0
+        return max(self.reset_at - time.monotonic(), 0.0)
+    
+    def acquire(self):
+        """Wait until the bucket has room, then reserve one request."""
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                if self.remaining <= 0 and now >= self.reset_at:
+                    if self.limit is not None:
+                        # The window has reset. Requests still in flight may land
+                        # in the new one, and the next response gives its real end
+                        self.remaining = self.limit - self.outgoing
+                        self.reset_at = now + self.window
+                    elif not self.outgoing:
+                        # A 429 without rate-limit headers blocked the bucket
+                        # before the limit was known; probe again once it expires
+                        self.remaining = 1
+                if self.remaining > 0:
+                    self.remaining -= 1
+                    self.outgoing += 1
+                    return
+                # Sleep until the reset, or until an outstanding request completes
+                timeout = self.reset_at - now
+                self.cond.wait(timeout if timeout > 0 else None)
+    
+    def complete(
+        self,
+        limit: Optional[int] = None,
+        remaining: Optional[int] = None,
+        reset_after: Optional[float] = None
+    ):
+        """Record the response (or failure) for a request from acquire()."""
+        with self.cond:
+            self.outgoing -= 1
+            if limit is not None:
+                self.limit = limit
+            if remaining is None or reset_after is None:
+                if self.limit is None:
+                    # The probe told us nothing; let the next one go
+                    self.remaining += 1
+            else:
+                reset_at = time.monotonic() + reset_after
+                unanswered = max(remaining - self.outgoing, 0)
+                if reset_at > self.reset_at + 0.05:
+                    # First answer from a new window
+                    self.remaining = unanswered
+                else:
+                    # Same window: answers can arrive out of order, so only go down
+                    self.remaining = min(self.remaining, unanswered)
+                self.window = max(self.window, reset_after)
+                self.reset_at = max(self.reset_at, reset_at)
+            self.cond.notify_all()
+    
+    def block(self, retry_after: float):
+        """Hold the bucket closed after a 429."""
+        with self.cond:
+            self.remaining = 0
+            self.reset_at = time.monotonic() + retry_after
+
+
+def _header_number(headers, name: str, kind: type) -> Optional[Union[int, float]]:
+    """Parse a numeric header, treating a missing or malformed value as absent."""
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return kind(value)
+    except ValueError:
+        return None
+
+
+def _make_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class WebhookSender:
+    """
+    Send webhook messages at the highest rate Discord allows.
+    
+    Rate-limit buckets are tracked per webhook from the X-RateLimit-* headers,
+    so requests wait for the window to reset instead of being rejected, and a
+    429 is retried after its retry_after. Queued embeds for the same webhook
+    are packed into one request with up to 10 embeds.
+    
+    Usage:
+        sender = WebhookSender()
+        sender.send(url, {"content": "Deploy finished"})
+        
+        for alert in alerts:
+            sender.queue_embed(url, {"title": alert.title, "description": alert.text})
+        sender.flush()
+    """
+    
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        pool_size: int = 10,
+        workers: int = 4,
+        max_retries: int = 5,
+        timeout: float = 10.0
+    ):
+        """
+        Args:
+            session (requests.Session, optional): Session to reuse. Defaults to
+                a new session with a connection pool of pool_size
+            pool_size (int): Connections kept open per host
+            workers (int): Background threads delivering queued messages.
+                Each webhook is sent by one thread at a time, in order
+            max_retries (int): Retries after a 429 before giving up
+            timeout (float): Request timeout in seconds
+        """
+        self.session = session or _make_session(pool_size)
+        self.pool_size = pool_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        
+        self._lock = threading.Lock()
+        # Discord rate-limits each webhook separately
+        self._buckets: Dict[str, _Bucket] = {}
+        self._global_reset_at = 0.0
+        self._counts = {"requests": 0, "batched": 0, "rate_limited": 0, "failures": 0}
+        
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Deque[Tuple[Dict[str, Any], Future]]] = {}
+        self._busy = set()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+    
+    def _bucket(self, url: str) -> _Bucket:
+        with self._lock:
+            return self._buckets.setdefault(url, _Bucket())
+    
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._counts[key] += amount
+    
+    def _wait_global(self):
+        wait = self._global_reset_at - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+    
+    def _update_bucket(self, bucket: _Bucket, response: requests.Response):
+        headers = response.headers
+        bucket.complete(
+            _header_number(headers, "X-RateLimit-Limit", int),
+            _header_number(headers, "X-RateLimit-Remaining", int),
+            _header_number(headers, "X-RateLimit-Reset-After", float)
+        )
+    
+    def delay(self, url: str) -> float:
+        """Seconds until the webhook's rate limit allows another request."""
+        global_wait = self._global_reset_at - time.monotonic()
+        return max(self._bucket(url).delay(), global_wait, 0.0)
+    
+    def post(self, url: str, payload: Union[Dict[str, Any], bytes]) -> requests.Response:
+        """
+        POST a payload, waiting on the rate limit and retrying 429s.
+        
+        Args:
+            url (str): Webhook URL
+            payload (dict or bytes): Message payload, or JSON already encoded
+        
+        Returns:
+            requests.Response: Final response (a 429 only if retries ran out)
+        
+        Raises:
+            requests.exceptions.RequestException: On connection errors
+        """
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        
+        bucket = self._bucket(url)
+        for attempt in range(self.max_retries + 1):
+            self._wait_global()
+            bucket.acquire()
+            try:
+                response = self.session.post(
+                    url,
+                    data=data,
+                    headers={"Content-Type": "application/json"},
+                    timeout=self.timeout
+                )
+            except Exception:
+                # Give the reservation back whatever went wrong
+                bucket.complete()
+                raise
+            self._count("requests")
+            self._update_bucket(bucket, response)
+            
+            if response.status_code != 429:
+                return response
+            
+            self._count("rate_limited")
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if not isinstance(body, dict):
+                body = {}
+            try:
+                retry_after = float(body.get("retry_after") or response.headers.get("Retry-After") or 1.0)
+            except (TypeError, ValueError):
+                retry_after = 1.0
+            if body.get("global") or response.headers.get("X-RateLimit-Global"):
+                self._global_reset_at = time.monotonic() + retry_after
+            else:
+                bucket.block(retry_after)
+        
+        return response
+    
+    def send(self, url: str, payload: Union[Dict[str, Any], bytes]) -> bool:
+        """
+        Send one message now.
+        
+        Args:
+            url (str): Webhook URL
+            payload (dict or bytes): Message payload, or JSON already encoded
+        
+        Returns:
+            bool: True if successful, False otherwise
+        
+        Raises:
+            TypeError: If the payload can't be encoded as JSON
+        """
+        try:
+            response = self.post(url, payload)
+        except requests.exceptions.RequestException:
+            self._count("failures")
+            return False
+        ok = response.status_code in (200, 204)
+        if not ok:
+            self._count("failures")
+        return ok
+    
+    def fan_out(
+        self,
+        urls: List[str],
+        payload: Dict[str, Any],
+        max_workers: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Send one payload to many webhooks concurrently.
+        
+        The payload is serialized once. Each webhook still gets its own
+        rate-limit handling, so a limited webhook doesn't hold up the rest.
+        
+        Args:
+            urls (list): Webhook URLs. Duplicates are sent once
+            payload (dict): Message payload
+            max_workers (int, optional): Concurrent requests. Defaults to the
+                connection pool size
+        
+        Returns:
+            dict: URL -> {"ok", "status", "error", "seconds"}
+        """
+        data = json.dumps(payload).encode("utf-8")
+        urls = list(dict.fromkeys(urls))
+        
+        def deliver(url: str) -> Dict[str, Any]:
+            start = time.perf_counter()
+            try:
+                response = self.post(url, data)
+            except Exception as e:
+                self._count("failures")
+                return {"ok": False, "status": None, "error": str(e), "seconds": time.perf_counter() - start}
+            ok = response.status_code in (200, 204)
+            if not ok:
+                self._count("failures")
+            return {
+                "ok": ok,
+                "status": response.status_code,
+                "error": None if ok else response.text,
+                "seconds": time.perf_counter() - start
+            }
+        
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers or self.pool_size, len(urls))) as executor:
+            return dict(zip(urls, executor.map(deliver, urls)))
+    
+    def queue(self, url: str, payload: Dict[str, Any]) -> Future:
+        """
+        Queue a message for background delivery.
+        
+        Messages for one webhook are delivered in order. Consecutive
+        embed-only messages are packed into a single request.
+        
+        Args:
+            url (str): Webhook URL
+            payload (dict): Message payload
+        
+        Returns:
+            Future: Resolves to True if delivered, False otherwise. Holds the
+            exception instead if sending raised one, e.g. for a payload that
+            can't be encoded as JSON
+        """
+        future = Future()
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("WebhookSender is closed")
+            self._pending.setdefault(url, deque()).append((payload, future))
+            if not self._threads:
+                for index in range(self.workers):
+                    thread = threading.Thread(target=self._run, name=f"webhook-sender-{index}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            self._cond.notify()
+        return future
+    
+    def queue_embed(
+        self,
+        url: str,
+        embed: Dict[str, Any],
+        username: Optional[str] = None,
+        avatar_url: Optional[str] = None
+    ) -> Future:
+        """Queue a single embed. See queue()."""
+        payload: Dict[str, Any] = {"embeds": [embed]}
+        if username:
+            payload["username"] = username
+        if avatar_url:
+            payload["avatar_url"] = avatar_url
+        return self.queue(url, payload)
+    
+    def _next_ready(self) -> Tuple[Optional[str], Optional[float]]:
+        """Pick a webhook with queued messages that may send now."""
+        shortest = None
+        for url, pending in self._pending.items():
+            if not pending or url in self._busy:
+                continue
+            wait = self.delay(url)
+            if wait <= 0:
+                return url, None
+            shortest = wait if shortest is None else min(shortest, wait)
+        return None, shortest
+    
+    def _take_batch(self, url: str) -> Tuple[Dict[str, Any], List[Future]]:
+        pending = self._pending[url]
+        payload, future = pending.popleft()
+        futures = [future]
+        if not _is_batchable(payload):
+            return payload, futures
+        
+        embeds = list(payload["embeds"])
+        chars = sum(_embed_chars(embed) for embed in embeds)
+        identity = (payload.get("username"), payload.get("avatar_url"))
+        while pending:
+            candidate, candidate_future = pending[0]
+            if not _is_batchable(candidate):
+                break
+            if (candidate.get("username"), candidate.get("avatar_url")) != identity:
+                break
+            extra = sum(_embed_chars(embed) for embed in candidate["embeds"])
+            if len(embeds) + len(candidate["embeds"]) > MAX_EMBEDS or chars + extra > MAX_EMBED_CHARS:
+                break
+            pending.popleft()
+            embeds.extend(candidate["embeds"])
+            chars += extra
+            futures.append(candidate_future)
+        return dict(payload, embeds=embeds), futures
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    url, wait = self._next_ready()
+                    if url is not None:
+                        break
+                    if self._stopping and not any(self._pending.values()):
+                        return
+                    self._cond.wait(wait)
+                payload, futures = self._take_batch(url)
+                self._busy.add(url)
+            
+            try:
+                ok = self.send(url, payload)
+            except Exception as e:
+                # Fail these messages but keep the worker and the queue going
+                self._count("failures")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                # Messages that rode along in another message's request
+                self._count("batched", len(futures) - 1)
+                for future in futures:
+                    if not future.done():
+                        future.set_result(ok)
+            finally:
+                with self._cond:
+                    self._busy.discard(url)
+                    if not self._pending.get(url):
+                        self._pending.pop(url, None)
+                    self._cond.notify_all()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued message has been delivered or has failed.
+        
+        Returns:
+            bool: False if the timeout expired first
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+    
+    def close(self, timeout: Optional[float] = None):
+        """Deliver queued messages, then stop the workers and the session."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.session.close()
+    
+    def stats(self) -> dict:
+        """Return counters for requests, batched messages, 429s and failures."""
+        with self._lock:
+            return dict(self._counts)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+_default_sender: Optional[WebhookSender] = None
+_default_lock = threading.Lock()
+
+
+def get_default_sender() -> WebhookSender:
+    """Return the process-wide sender shared by send_webhook and send_embed."""
+    global _default_sender
+    with _default_lock:
+        if _default_sender is None:
+            _default_sender = WebhookSender()
+        return _default_sender